@@ -0,0 +1,88 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus():
+    """CPUs this process may use, honouring the container (cgroup) CPU limit."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0:
+                cpus = min(cpus, math.ceil(quota / period))
+        except (OSError, ValueError):
+            pass
+    return max(1, cpus)
+
+
+class AnalyzerPool:
+    """
+    Process pool for the pure-Python, CPU-bound rule-based analyzers.
+
+    Each worker runs `initializer` once to load its lexicon, then receives
+    chunks of the input list; `func` maps a chunk (list) to a list of results
+    of the same length. Results are merged back in input order.
+
+    Workers are started with the "forkserver" method where available, so they
+    are forked from a clean process rather than from a threaded server; `func`
+    and `initializer` must therefore be importable module-level functions.
+    """
+
+    def __init__(self, name, func, initializer=None, initargs=(), processes=None, chunk_size=1000):
+        self.name = name
+        self.func = func
+        self.initializer = initializer
+        self.initargs = initargs
+        self.processes = processes or available_cpus()
+        self.chunk_size = chunk_size
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                logger.info(f"Starting {self.name} pool with {self.processes} processes")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=context,
+                    initializer=self.initializer,
+                    initargs=self.initargs
+                )
+            return self._executor
+
+    def map(self, items):
+        """Apply func to items across the pool, returning results in input order."""
+        items = list(items)
+        if not items:
+            return []
+        # Enough chunks to keep every process busy, but not smaller than chunk_size.
+        size = max(self.chunk_size, math.ceil(len(items) / (self.processes * 4)))
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        results = []
+        for chunk_result in self._get_executor().map(self.func, chunks):
+            results.extend(chunk_result)
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
@@ -1,8 +1,9 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import json
 import logging
-import sys
 import os
+import queue
 import re
 import threading
 
@@ -10,25 +11,15 @@ torch = None
 torch_import_error = None
 torch_import_lock = threading.Lock()
 
-# Add the lemmatizer path to sys.path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'model', 'NepaliLemmatizer'))
-
-# Add the stemmer path to sys.path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'model', 'stemmer'))
-
-try:
-    from main import lemmatize_word
-    lemmatizer_available = True
-except ImportError as e:
-    logging.warning(f"Could not import lemmatizer: {e}")
-    lemmatizer_available = False
-
-try:
-    from morph import Morph
-    stemmer_available = True
-except ImportError as e:
-    logging.warning(f"Could not import stemmer: {e}")
-    stemmer_available = False
+from micro_batcher import MicroBatcher
+from model_registry import ModelRegistry, parse_enabled_models
+import rule_based
+from rule_based import (
+    model_disabled,
+    model_not_ready,
+    register_error_handlers,
+    rule_based_routes,
+)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -37,23 +28,14 @@ CORS(app)  # Enable CORS for all routes
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Models this worker serves, e.g. ENABLED_MODELS=ner,aspect for a replica that
+# only needs the BERT models; endpoints of the other models answer 404.
+ALL_MODELS = ("generate", "ner", "lemmatize", "stemmer", "aspect")
+ENABLED_MODELS = parse_enabled_models(os.environ.get("ENABLED_MODELS", ",".join(ALL_MODELS)), ALL_MODELS)
+
 # Disable tokenizer worker threads in constrained containers.
 os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
 
-# Global variables for model and tokenizer
-tokenizer = None
-model = None
-ner_pipeline = None
-stemmer = None
-aspect_tokenizer = None
-aspect_model = None
-
-# Track model loading state so the server can start even if model load is slow.
-models_loading = False
-models_loaded = False
-model_load_error = None
-model_load_lock = threading.Lock()
-
 
 def ensure_torch_loaded():
     """Load torch lazily and only once per process."""
@@ -77,148 +59,228 @@ def ensure_torch_loaded():
             return False
 
 
-def _load_models_background():
-    """Load all models in a background thread and track status."""
-    global models_loading, models_loaded, model_load_error
-    try:
-        success = load_model()
-        models_loaded = bool(success)
-        if not success and model_load_error is None:
-            model_load_error = "Model initialization failed"
-    except Exception as e:
-        models_loaded = False
-        model_load_error = str(e)
-        logger.error(f"Unexpected model loading error: {str(e)}")
-    finally:
-        models_loading = False
+def require_torch():
+    """Raise if torch cannot be imported, for loaders of torch models."""
+    if not ensure_torch_loaded():
+        raise RuntimeError(f"torch import failed: {torch_import_error}")
 
 
-def trigger_model_loading_async(force=False):
-    """Start model loading in background if needed."""
-    global models_loading, model_load_error
-    with model_load_lock:
-        if models_loading:
-            return
-        if models_loaded and not force:
-            return
+# Most /generate requests decoded together by the generation engine
+GENERATE_MAX_BATCH_SIZE = max(1, int(os.environ.get("GENERATE_MAX_BATCH_SIZE", 8)))
+# Memory for cached prompt prefixes (0 disables), in blocks of PREFIX_CACHE_BLOCK tokens
+PREFIX_CACHE_MB = float(os.environ.get("PREFIX_CACHE_MB", 256))
+PREFIX_CACHE_BLOCK = max(1, int(os.environ.get("PREFIX_CACHE_BLOCK", 16)))
+# Longest a /generate request waits for its text (streaming: for each next token) before giving up
+GENERATE_TIMEOUT_S = float(os.environ.get("GENERATE_TIMEOUT_S", 300))
+# Fast tokenizers raise "Already borrowed" when threads encode at the same time
+tokenizer_lock = threading.Lock()
 
-        models_loading = True
-        model_load_error = None
-        threading.Thread(target=_load_models_background, daemon=True).start()
 
-def load_model():
-    """Load the model and tokenizer"""
-    global tokenizer, model, ner_pipeline, stemmer, model_load_error
-    try:
-        # Import torch first so native extension initialization happens once.
-        if not ensure_torch_loaded():
-            model_load_error = f"torch import failed: {torch_import_error}"
-            logger.error(model_load_error)
-            return False
+def load_generator():
+    """Load the NepaliGPT tokenizer and model, and the engine that generates with it"""
+    require_torch()
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+    from generation_engine import GenerationEngine
+    from prefix_cache import PrefixCache
 
-        from transformers import (
-            AutoTokenizer,
-            AutoModelForCausalLM,
-            pipeline,
-            BertTokenizer,
-            BertForSequenceClassification,
-        )
+    tokenizer = AutoTokenizer.from_pretrained("Shushant/thesis_nepaliGPT")
+    model = AutoModelForCausalLM.from_pretrained("Shushant/thesis_nepaliGPT")
 
-        logger.info("Loading NepaliGPT model and tokenizer...")
-        tokenizer = AutoTokenizer.from_pretrained("Shushant/thesis_nepaliGPT")
-        model = AutoModelForCausalLM.from_pretrained("Shushant/thesis_nepaliGPT")
-        
-        # Set pad token if not exists
-        if tokenizer.pad_token is None:
-            tokenizer.pad_token = tokenizer.eos_token
-            
-        logger.info("Model and tokenizer loaded successfully!")
-        
-        logger.info("Loading NER model...")
-        ner_pipeline = pipeline("ner", model="bishaldpande/Ner-xlm-roberta-base")
-        logger.info("NER model loaded successfully!")
-        
-        # Load stemmer
-        if stemmer_available:
-            logger.info("Loading Stemmer model...")
-            try:
-                root_file = os.path.join(os.path.dirname(__file__), 'model', 'stemmer', 'files', 'root')
-                suffix_file = os.path.join(os.path.dirname(__file__), 'model', 'stemmer', 'files', 'suffix.txt')
-                suffix_rule_file = os.path.join(os.path.dirname(__file__), 'model', 'stemmer', 'files', 'suffix_rule.txt')
-                
-                stemmer = Morph(root_file, suffix_file, suffix_rule_file)
-                logger.info("Stemmer model loaded successfully!")
-            except Exception as e:
-                logger.error(f"Error loading stemmer: {str(e)}")
-        
-        # Load Aspect-Based Sentiment Analysis model
-        logger.info("Loading Aspect-Based Sentiment Analysis model...")
+    # Set pad token if not exists
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    prefix_cache = PrefixCache(int(PREFIX_CACHE_MB * 1024 * 1024), PREFIX_CACHE_BLOCK) if PREFIX_CACHE_MB > 0 else None
+    engine = GenerationEngine(
+        model,
+        max_batch_size=GENERATE_MAX_BATCH_SIZE,
+        no_repeat_ngram_size=2,
+        prefix_cache=prefix_cache
+    )
+    return tokenizer, model, engine
+
+
+def load_ner():
+    """Load the NER pipeline"""
+    require_torch()
+    from transformers import pipeline
+
+    return pipeline("ner", model="bishaldpande/Ner-xlm-roberta-base")
+
+
+def load_aspect_model():
+    """Load the aspect-based sentiment analysis tokenizer and model"""
+    require_torch()
+    from transformers import BertTokenizer, BertForSequenceClassification
+
+    model_name = "Karinkato/Aspect_based_sentiment_analysis"
+    aspect_tokenizer = BertTokenizer.from_pretrained(model_name)
+    aspect_model = BertForSequenceClassification.from_pretrained(model_name, num_labels=4)
+
+    # Set device to GPU if available
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    aspect_model.to(device)
+    aspect_model.eval()
+    return aspect_tokenizer, aspect_model, device
+
+
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_generation(tokenizer, generation, streamer, prompt):
+    """
+    Server-sent events for a submitted /generate request: a "token" event with
+    each new piece of text from its streamer, then one "done" event with the
+    same payload as the non-streaming response, or an "error" event.
+
+    When the client disconnects the server closes this generator, and the
+    engine drops the sequence at the next token boundary.
+    """
+    try:
         try:
-            global aspect_tokenizer, aspect_model
-            model_name = "Karinkato/Aspect_based_sentiment_analysis"
-            aspect_tokenizer = BertTokenizer.from_pretrained(model_name)
-            aspect_model = BertForSequenceClassification.from_pretrained(model_name,num_labels=4)
-            
-            # Set device to GPU if available
-            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            aspect_model.to(device)
-            aspect_model.eval()
-            
-            logger.info("Aspect-Based Sentiment Analysis model loaded successfully!")
+            for text in streamer:
+                if text:
+                    yield sse_event("token", {"text": text})
+            output_ids = generation.result(timeout=GENERATE_TIMEOUT_S)
+        except queue.Empty:
+            logger.error("Text generation timed out")
+            yield sse_event("error", {"error": "Generation timed out", "message": f"No new token within {GENERATE_TIMEOUT_S:g}s"})
+            return
         except Exception as e:
-            logger.error(f"Error loading aspect model: {str(e)}")
-        
-        return True
-    except Exception as e:
-        model_load_error = str(e)
-        logger.error(f"Error loading model: {str(e)}")
-        return False
-
+            logger.error(f"Error during text generation: {str(e)}")
+            yield sse_event("error", {"error": "Generation failed", "message": str(e)})
+            return
 
-# Import torch on worker startup to avoid concurrent first-import races.
-if not ensure_torch_loaded():
+        generated_text = tokenizer.decode(output_ids, skip_special_tokens=True)
+        logger.info("Text generated successfully!")
+        yield sse_event("done", {
+            "prompt": prompt,
+            "response": generated_text[len(prompt):].strip(),
+            "full_text": generated_text,
+            "success": True
+        })
+    finally:
+        if not generation.done():
+            logger.info("Client disconnected, cancelling generation")
+            generation.cancel()
+
+
+# Labels mapping used during training
+ASPECT_LABELS = ["FEEDBACK", "GENERAL", "PROFANITY", "VIOLENCE"]
+# Most sentences run through the aspect model in one forward pass
+ASPECT_BATCH_SIZE = max(1, int(os.environ.get("ASPECT_BATCH_SIZE", 32)))
+
+
+def predict_aspects(aspect, sentences):
+    """
+    Aspect labels of each sentence, in batched forward passes.
+
+    Each distinct sentence is classified once. Sentences are sorted by token
+    length before being cut into batches of at most ASPECT_BATCH_SIZE, so a
+    batch is padded only up to similar lengths; the attention mask keeps the
+    padding from changing the logits.
+    """
+    aspect_tokenizer, aspect_model, device = aspect
+    unique_sentences = list(dict.fromkeys(sentences))
+    encoded = aspect_tokenizer(unique_sentences, truncation=True, max_length=128)
+    features = [
+        {key: encoded[key][i] for key in encoded.keys()}
+        for i in range(len(unique_sentences))
+    ]
+    order = sorted(range(len(unique_sentences)), key=lambda i: len(features[i]["input_ids"]))
+
+    aspects = {}
+    for start in range(0, len(order), ASPECT_BATCH_SIZE):
+        batch = order[start:start + ASPECT_BATCH_SIZE]
+        inputs = aspect_tokenizer.pad([features[i] for i in batch], return_tensors='pt')
+
+        # Move inputs to the same device as the model
+        inputs = {key: tensor.to(device) for key, tensor in inputs.items()}
+
+        # Get predictions from the model
+        with torch.no_grad():
+            outputs = aspect_model(**inputs)
+
+        # Get the predicted labels by applying a threshold
+        predicted_labels_bool = torch.sigmoid(outputs.logits) > 0.5
+        for i, labels in zip(batch, predicted_labels_bool.tolist()):
+            aspects[unique_sentences[i]] = [ASPECT_LABELS[j] for j, val in enumerate(labels) if val]
+
+    return [aspects[sentence] for sentence in sentences]
+
+
+def run_ner_batch(texts):
+    """Entities of each text, from one batched pipeline call"""
+    return models.get("ner")(texts, batch_size=len(texts))
+
+
+def run_aspect_batch(sentences):
+    """Aspect labels of each sentence, see predict_aspects"""
+    return predict_aspects(models.get("aspect"), sentences)
+
+
+# Every model loads on its own, so the rule-based endpoints never wait behind a
+# multi-GB download. The torch models load in background threads and their
+# endpoints answer 503 until they are ready; the rule-based ones load on first use.
+models = ModelRegistry()
+if "generate" in ENABLED_MODELS:
+    models.register("generate", load_generator)
+if "ner" in ENABLED_MODELS:
+    models.register("ner", load_ner)
+if "aspect" in ENABLED_MODELS:
+    models.register("aspect", load_aspect_model)
+
+# Concurrent /ner and /aspect requests are queued for up to *_BATCH_WAIT_MS
+# and run together, up to *_BATCH_MAX_ITEMS texts or sentences per batch.
+batchers = {}
+if "ner" in ENABLED_MODELS:
+    batchers["ner"] = MicroBatcher(
+        "ner", run_ner_batch,
+        max_batch_items=int(os.environ.get("NER_BATCH_MAX_ITEMS", 16)),
+        max_wait_ms=float(os.environ.get("NER_BATCH_WAIT_MS", 5))
+    )
+if "aspect" in ENABLED_MODELS:
+    batchers["aspect"] = MicroBatcher(
+        "aspect", run_aspect_batch,
+        max_batch_items=int(os.environ.get("ASPECT_BATCH_MAX_ITEMS", 64)),
+        max_wait_ms=float(os.environ.get("ASPECT_BATCH_WAIT_MS", 5))
+    )
+
+app.config["ENABLED_MODELS"] = ENABLED_MODELS
+app.extensions["models"] = models
+app.register_blueprint(rule_based_routes)
+register_error_handlers(app)
+
+
+# Import torch on worker startup to avoid concurrent first-import races; a
+# worker without torch models never needs it.
+if any(name in ENABLED_MODELS for name in ("generate", "ner", "aspect")) and not ensure_torch_loaded():
     logger.warning(f"PyTorch import failed at startup: {torch_import_error}")
 
+# The rule-based models need no download, so load them (and warm their caches) right away.
+rule_based.register_models(models, ENABLED_MODELS)
+
 @app.route('/')
 def index():
     """Root route for SSL certificate verification and service identification"""
-    return {
-        "status": "ok", 
-        "service": "nlp-backend",
-        "message": "Nepali NLP Backend API is running",
-        "version": "1.0.0",
-        "endpoints": {
-            "health": "/health",
-            "models": "/model-info",
-            "generate": "/generate",
-            "ner": "/ner",
-            "lemmatize": "/lemmatize",
-            "stemmer": "/stemmer",
-            "aspect": "/aspect"
-        }
-    }
+    return rule_based.service_index()
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "models_loading": models_loading,
-        "models_ready": models_loaded,
-        "model_load_error": model_load_error,
-        "torch_available": torch is not None,
-        "torch_import_error": torch_import_error,
-        "model_loaded": model is not None,
-        "ner_loaded": ner_pipeline is not None,
-        "lemmatizer_loaded": lemmatizer_available,
-        "stemmer_loaded": stemmer is not None,
-        "aspect_loaded": aspect_model is not None,
-        "message": "NLP Models API is running"
-    })
+    status = rule_based.health_status(torch is not None, torch_import_error)
+    status["batching"] = {name: batcher.stats() for name, batcher in batchers.items()}
+    generator = models.get("generate")
+    if generator is not None:
+        status["batching"]["generate"] = generator[2].stats()
+    return jsonify(status)
 
 @app.route('/generate', methods=['POST'])
 def generate():
     """Generate text using NepaliGPT model"""
+    if "generate" not in ENABLED_MODELS:
+        return model_disabled("generate")
     try:
         if not ensure_torch_loaded():
             return jsonify({
@@ -226,16 +288,13 @@ def generate():
                 "message": torch_import_error
             }), 503
 
-        trigger_model_loading_async()
+        models.load_async("generate")
 
         # Check if model is loaded
-        if model is None or tokenizer is None:
-            return jsonify({
-                "error": "Model not loaded",
-                "message": "Please wait for the model to load",
-                "models_loading": models_loading,
-                "last_error": model_load_error
-            }), 503
+        generator = models.get("generate")
+        if generator is None:
+            return model_not_ready("generate", "Model not loaded", "Please wait for the model to load")
+        tokenizer, model, engine = generator
 
         # Get data from request
         data = request.json
@@ -250,32 +309,52 @@ def generate():
         max_length = data.get("max_length", 100)
         temperature = data.get("temperature", 0.7)
         do_sample = data.get("do_sample", True)
+        stream = data.get("stream", False)
         
         logger.info(f"Generating text for prompt: {prompt[:50]}...")
 
         # Tokenize input
-        inputs = tokenizer(
-            prompt, 
-            return_tensors="pt", 
-            padding=True, 
-            truncation=True,
-            max_length=512
+        with tokenizer_lock:
+            input_ids = tokenizer(prompt, truncation=True, max_length=512)["input_ids"]
+
+        # The engine decodes this prompt together with the other running requests,
+        # with no_repeat_ngram_size=2 as before
+        generate_kwargs = dict(
+            max_length=max_length,
+            temperature=temperature,
+            do_sample=do_sample
         )
 
-        # Generate text
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
-                max_length=max_length,
-                temperature=temperature,
-                do_sample=do_sample,
-                pad_token_id=tokenizer.eos_token_id,
-                no_repeat_ngram_size=2,
-                early_stopping=True
+        # Stream tokens as server-sent events so the first token shows up right away
+        if stream:
+            from transformers import TextIteratorStreamer
+
+            # Submit before the response starts, so invalid arguments still get a 500
+            streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=GENERATE_TIMEOUT_S)
+            generation = engine.submit(input_ids, streamer=streamer, **generate_kwargs)
+            response = Response(
+                stream_generation(tokenizer, generation, streamer, prompt),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
             )
+            # Also cancel when the response is closed before the stream started
+            response.call_on_close(generation.cancel)
+            return response
+
+        # Generate text
+        generation = engine.submit(input_ids, **generate_kwargs)
+        try:
+            output_ids = generation.result(timeout=GENERATE_TIMEOUT_S)
+        except TimeoutError:
+            generation.cancel()
+            logger.error("Text generation timed out")
+            return jsonify({
+                "error": "Generation timed out",
+                "message": f"No result within {GENERATE_TIMEOUT_S:g}s"
+            }), 504
 
         # Decode the generated text
-        generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        generated_text = tokenizer.decode(output_ids, skip_special_tokens=True)
         
         # Remove the original prompt from the response to get only the generated part
         response_text = generated_text[len(prompt):].strip()
@@ -299,17 +378,15 @@ def generate():
 @app.route('/ner', methods=['POST'])
 def named_entity_recognition():
     """Perform Named Entity Recognition using BERT-based model"""
+    if "ner" not in ENABLED_MODELS:
+        return model_disabled("ner")
     try:
-        trigger_model_loading_async()
+        models.load_async("ner")
 
         # Check if NER model is loaded
+        ner_pipeline = models.get("ner")
         if ner_pipeline is None:
-            return jsonify({
-                "error": "NER model not loaded",
-                "message": "Please wait for the NER model to load",
-                "models_loading": models_loading,
-                "last_error": model_load_error
-            }), 503
+            return model_not_ready("ner", "NER model not loaded", "Please wait for the NER model to load")
 
         # Get data from request
         data = request.json
@@ -322,8 +399,8 @@ def named_entity_recognition():
         
         logger.info(f"Performing NER on text: {text[:50]}...")
 
-        # Perform NER
-        entities = ner_pipeline(text)
+        # Perform NER, batched with concurrent requests
+        entities = batchers["ner"]([text])[0]
         
         # Format entities for better readability
         formatted_entities = []
@@ -352,183 +429,11 @@ def named_entity_recognition():
             "message": str(e)
         }), 500
 
-@app.route('/lemmatize', methods=['POST'])
-def lemmatize():
-    """Lemmatize Nepali words using NepaliLemmatizer"""
-    try:
-        # Check if lemmatizer is available
-        if not lemmatizer_available:
-            return jsonify({
-                "error": "Lemmatizer not available",
-                "message": "NepaliLemmatizer could not be loaded"
-            }), 503
-
-        # Get data from request
-        data = request.json
-        if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
-            
-        text = data.get("text", "")
-        if not text:
-            return jsonify({"error": "No text provided"}), 400
-        
-        logger.info(f"Lemmatizing text: {text[:50]}...")
-
-        # Split text into words and lemmatize each word
-        words = text.split()
-        lemmatized_words = []
-        
-        for word in words:
-            try:
-                lemma = lemmatize_word(word.strip())
-                lemmatized_words.append({
-                    "original": word,
-                    "lemma": lemma
-                })
-            except Exception as e:
-                logger.warning(f"Error lemmatizing word '{word}': {str(e)}")
-                # If lemmatization fails for a word, keep the original
-                lemmatized_words.append({
-                    "original": word,
-                    "lemma": word
-                })
-        
-        # Create the lemmatized text
-        lemmatized_text = " ".join([item["lemma"] for item in lemmatized_words])
-        
-        logger.info(f"Lemmatized {len(words)} words successfully!")
-
-        return jsonify({
-            "original_text": text,
-            "lemmatized_text": lemmatized_text,
-            "word_details": lemmatized_words,
-            "word_count": len(words),
-            "success": True
-        })
-
-    except Exception as e:
-        logger.error(f"Error during lemmatization: {str(e)}")
-        return jsonify({
-            "error": "Lemmatization failed",
-            "message": str(e)
-        }), 500
-
-@app.route('/stemmer', methods=['POST'])
-def analyze_stemmer():
-    """Analyze Nepali words using morphological analyzer (stemmer)"""
-    try:
-        trigger_model_loading_async()
-
-        # Check if stemmer is loaded
-        if stemmer is None:
-            return jsonify({
-                "error": "Stemmer not loaded",
-                "message": "Stemmer model is not available",
-                "models_loading": models_loading,
-                "last_error": model_load_error
-            }), 503
-
-        # Get data from request
-        data = request.json
-        if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
-            
-        text = data.get("text", "")
-        if not text:
-            return jsonify({"error": "No text provided"}), 400
-
-        logger.info(f"Analyzing text with stemmer: {text[:50]}...")
-
-        # Extract Nepali words from input (remove punctuation and split)
-        words = re.findall(r'[\u0900-\u097F]+', text)
-        
-        if not words:
-            return jsonify({
-                "error": "No Nepali words found",
-                "message": "The input text does not contain any Nepali words"
-            }), 400
-
-        analyzed_words = []
-        root_count = 0
-        
-        for word in words:
-            word = word.strip()
-            if not word:
-                continue
-                
-            word_analysis = {
-                'word': word,
-                'is_root': False,
-                'analyses': []
-            }
-            
-            # Check if the word is directly in the root list
-            if word in stemmer.roots:
-                word_analysis['is_root'] = True
-                pos = stemmer.pos.get(word, "Unknown")
-                word_analysis['analyses'].append({
-                    'type': 'Root Word',
-                    'root': word,
-                    'suffix': '',
-                    'pos': pos,
-                    'rule': ''
-                })
-                root_count += 1
-            
-            # Try to find possible roots by removing suffixes
-            for suffix in stemmer.suffixes:
-                if word.endswith(suffix) and len(word) > len(suffix):
-                    potential_root = word[:-len(suffix)]
-                    if potential_root in stemmer.roots:
-                        pos = stemmer.pos.get(potential_root, "Unknown")
-                        rule = stemmer.suffix_rules.get(suffix, "Unknown")
-                        word_analysis['analyses'].append({
-                            'type': 'Root + Suffix',
-                            'root': potential_root,
-                            'suffix': suffix,
-                            'pos': pos,
-                            'rule': rule
-                        })
-            
-            # If no analysis found, mark as unknown
-            if not word_analysis['analyses']:
-                word_analysis['analyses'].append({
-                    'type': 'Unknown',
-                    'root': '-',
-                    'suffix': '-',
-                    'pos': 'Not found',
-                    'rule': '-'
-                })
-            
-            analyzed_words.append(word_analysis)
-
-        # Create summary statistics
-        analyzed_count = sum(1 for w in analyzed_words if any(a['type'] != 'Unknown' for a in w['analyses']))
-        
-        logger.info(f"Analyzed {len(words)} words with stemmer successfully!")
-
-        return jsonify({
-            "original_text": text,
-            "words": analyzed_words,
-            "statistics": {
-                "total_words": len(words),
-                "root_words": root_count,
-                "analyzed_words": analyzed_count,
-                "unknown_words": len(words) - analyzed_count
-            },
-            "success": True
-        })
-
-    except Exception as e:
-        logger.error(f"Error during stemmer analysis: {str(e)}")
-        return jsonify({
-            "error": "Stemmer analysis failed",
-            "message": str(e)
-        }), 500
-
 @app.route('/aspect', methods=['POST'])
 def aspect_analysis():
     """Perform aspect-based sentiment analysis on Nepali text"""
+    if "aspect" not in ENABLED_MODELS:
+        return model_disabled("aspect")
     try:
         if not ensure_torch_loaded():
             return jsonify({
@@ -536,16 +441,12 @@ def aspect_analysis():
                 "message": torch_import_error
             }), 503
 
-        trigger_model_loading_async()
+        models.load_async("aspect")
 
         # Check if model is loaded
-        if aspect_model is None or aspect_tokenizer is None:
-            return jsonify({
-                "error": "Aspect model not loaded",
-                "message": "Please wait for the aspect model to load",
-                "models_loading": models_loading,
-                "last_error": model_load_error
-            }), 503
+        aspect = models.get("aspect")
+        if aspect is None:
+            return model_not_ready("aspect", "Aspect model not loaded", "Please wait for the aspect model to load")
 
         # Get the input text
         data = request.get_json()
@@ -569,49 +470,13 @@ def aspect_analysis():
         if not sentences:
             sentences = [text]  # If no sentence delimiters found, treat as single sentence
 
-        # Labels mapping used during training
-        labels_mapping = ["FEEDBACK", "GENERAL", "PROFANITY", "VIOLENCE"]
-        
-        predictions = []
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-        for sentence in sentences:
-            if not sentence.strip():
-                continue
-                
-            # Tokenize the sentence
-            inputs = aspect_tokenizer(
-                sentence, 
-                return_tensors='pt', 
-                padding=True, 
-                truncation=True, 
-                max_length=128
-            )
-
-            # Move inputs to the same device as the model
-            inputs = {key: tensor.to(device) for key, tensor in inputs.items()}
-
-            # Get predictions from the model
-            with torch.no_grad():
-                outputs = aspect_model(**inputs)
-
-            # Get the predicted labels by applying a threshold
-            logits = outputs.logits
-            predicted_labels_bool = torch.sigmoid(logits) > 0.5
-
-            # Convert the boolean predictions to string labels
-            predicted_labels_str = [
-                [labels_mapping[i] for i, val in enumerate(labels) if val] 
-                for labels in predicted_labels_bool.tolist()
-            ]
-
-            # Flatten the list of lists for cleaner output
-            predicted_flat = [item for sublist in predicted_labels_str for item in sublist]
-
-            predictions.append({
-                "sentence": sentence,
-                "aspects": predicted_flat if predicted_flat else []
-            })
+        # Classify all sentences together, batched with concurrent requests;
+        # duplicates share one prediction
+        sentences = [sentence for sentence in sentences if sentence.strip()]
+        predictions = [
+            {"sentence": sentence, "aspects": labels}
+            for sentence, labels in zip(sentences, batchers["aspect"](sentences))
+        ]
 
         logger.info(f"Analyzed {len(predictions)} sentences with aspect model successfully!")
 
@@ -634,67 +499,53 @@ def aspect_analysis():
 
 @app.route('/model-info', methods=['GET'])
 def model_info():
-    """Get information about the loaded models"""
-    if model is None or tokenizer is None:
+    """Get information about the enabled models"""
+    generator = models.get("generate")
+    if "generate" in ENABLED_MODELS and generator is None:
         return jsonify({
             "error": "Models not loaded"
         }), 503
-        
-    return jsonify({
-        "nepali_gpt": {
+    status = models.status()
+
+    info = {}
+    if "generate" in ENABLED_MODELS:
+        tokenizer, model, engine = generator
+        info["nepali_gpt"] = {
             "model_name": "Shushant/thesis_nepaliGPT",
             "model_type": "Causal Language Model",
             "description": "A GPT model fine-tuned for Nepali language generation",
             "vocab_size": tokenizer.vocab_size,
             "max_position_embeddings": getattr(model.config, 'max_position_embeddings', 'N/A'),
-            "model_loaded": True
-        },
-        "ner_model": {
+            "model_loaded": True,
+            "load_seconds": status["generate"]["load_seconds"]
+        }
+    if "ner" in ENABLED_MODELS:
+        info["ner_model"] = {
             "model_name": "bishaldpande/Ner-xlm-roberta-base",
             "model_type": "Named Entity Recognition",
             "description": "BERT-based model for Named Entity Recognition in Nepali text",
-            "model_loaded": ner_pipeline is not None
-        },
-        "lemmatizer": {
-            "model_name": "NepaliLemmatizer",
-            "model_type": "Lemmatization",
-            "description": "Rule-based lemmatizer for Nepali words",
-            "model_loaded": lemmatizer_available
-        },
-        "stemmer": {
-            "model_name": "NepaliStemmer",
-            "model_type": "Morphological Analysis",
-            "description": "Morphological analyzer for Nepali words to find roots and suffixes",
-            "model_loaded": stemmer is not None
-        },
-        "aspect_model": {
+            "model_loaded": status["ner"]["ready"],
+            "load_seconds": status["ner"]["load_seconds"]
+        }
+    info.update(rule_based.rule_based_model_info())
+    if "aspect" in ENABLED_MODELS:
+        info["aspect_model"] = {
             "model_name": "Karinkato/Aspect_based_sentiment_analysis",
             "model_type": "Aspect-Based Sentiment Analysis",
             "description": "BERT-based model for aspect categorization and sentiment analysis in Nepali text",
-            "aspects": ["FEEDBACK", "GENERAL", "PROFANITY", "VIOLENCE"],
-            "model_loaded": aspect_model is not None
+            "aspects": ASPECT_LABELS,
+            "model_loaded": status["aspect"]["ready"],
+            "load_seconds": status["aspect"]["load_seconds"]
         }
-    })
-
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({
-        "error": "Endpoint not found",
-        "message": "The requested endpoint does not exist"
-    }), 404
-
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({
-        "error": "Internal server error",
-        "message": "An unexpected error occurred"
-    }), 500
+    info["enabled_models"] = ENABLED_MODELS
+
+    return jsonify(info)
 
 if __name__ == '__main__':
     logger.info("Starting NepaliGPT Flask API...")
 
-    # Start model loading in background so service is reachable during startup.
-    trigger_model_loading_async(force=True)
+    # Start every model loading in background so service is reachable during startup.
+    models.load_all_async()
 
     # Get port from environment variable or default to 8000
     port = int(os.environ.get('PORT', 8000))
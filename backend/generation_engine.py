@@ -0,0 +1,373 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import torch
+from transformers import (
+    LogitsProcessorList,
+    TemperatureLogitsWarper,
+    TopKLogitsWarper,
+    TopPLogitsWarper,
+)
+
+from no_repeat_ngram import IncrementalNoRepeatNGramLogitsProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationRequest:
+    """
+    One prompt being generated by a GenerationEngine.
+
+    result() waits for the prompt and generated token ids; cancel() makes the
+    engine drop the sequence at the next token boundary. A streamer, such as
+    transformers' TextIteratorStreamer, gets the prompt and then every new
+    token, the same calls model.generate makes.
+    """
+
+    def __init__(self, input_ids, max_length, do_sample, processors, streamer=None):
+        self.ids = list(input_ids)
+        self.prompt_length = len(self.ids)
+        # The same ids as a tensor with room for every token, handed to the logits processors
+        self._token_ids = torch.empty(1, max(max_length, len(self.ids) + 1), dtype=torch.long)
+        self._token_ids[0, :len(self.ids)] = torch.tensor(self.ids, dtype=torch.long)
+        self.max_length = max_length
+        self.do_sample = do_sample
+        self.processors = processors
+        self.streamer = streamer
+        self.error = None
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Prompt and generated token ids; raises the generation error, if any."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("Generation did not finish in time")
+        if self.error is not None:
+            raise self.error
+        return self.ids
+
+    @property
+    def token_ids(self):
+        """Prompt and generated ids so far, shaped (1, length)"""
+        return self._token_ids[:, :len(self.ids)]
+
+    def append(self, token):
+        self._token_ids[0, len(self.ids)] = token
+        self.ids.append(token)
+
+    def _finish(self, error=None):
+        self.error = error
+        if self.streamer is not None:
+            self.streamer.end()
+        self._done.set()
+
+
+class GenerationEngine:
+    """
+    Continuous batching for a causal language model.
+
+    A single scheduler thread owns the model. New prompts are prefilled one at
+    a time and join the running batch at the next token boundary; every step
+    then decodes one token for all running sequences in a single forward pass.
+    A sequence that reaches its max_length, produces the end-of-sequence token
+    or is cancelled leaves the batch right away, without waiting for the rest.
+
+    The key/value cache of the batch is left padded: each row holds one
+    sequence's cache aligned to the right, the attention mask hides the padding
+    and position ids are counted per row. Caches are the legacy tuple of
+    (key, value) tensors shaped (batch, heads, length, head dim), as GPT-2
+    models return them.
+
+    With a PrefixCache, a prompt whose leading blocks were prefilled before
+    reuses their keys and values and only prefills the rest.
+
+    Each request is decoded as model.generate would with the same arguments:
+    no_repeat_ngram_size, then temperature, top_k and top_p from the model's
+    generation config when sampling, greedy argmax otherwise. The n-gram ban
+    is kept up to date token by token (see no_repeat_ngram) rather than rebuilt
+    from the whole sequence every step.
+    """
+
+    def __init__(self, model, max_batch_size=8, no_repeat_ngram_size=2, prefix_cache=None):
+        self.model = model
+        self.prefix_cache = prefix_cache
+        self.max_batch_size = max(1, max_batch_size)
+        self.no_repeat_ngram_size = no_repeat_ngram_size
+        config = model.generation_config
+        eos_token_id = config.eos_token_id
+        self.eos_token_ids = set(eos_token_id if isinstance(eos_token_id, list) else [eos_token_id]) - {None}
+        self.top_k = config.top_k
+        self.top_p = config.top_p
+        self.max_positions = getattr(model.config, "max_position_embeddings", None)
+
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+
+        # Batch state, touched only by the scheduler thread
+        self._running = []
+        self._past = None
+        self._mask = None
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.steps = 0
+        self.step_sequences = 0
+        self.tokens = 0
+        self.busy_seconds = 0.0
+        self.max_batch_seen = 0
+
+    def submit(self, input_ids, max_length=100, temperature=1.0, do_sample=False, streamer=None):
+        """
+        Queue a prompt for generation.
+
+        :param input_ids: prompt token ids
+        :param max_length: most tokens in prompt plus generated text, as in model.generate
+        :return: GenerationRequest
+        """
+        if self.max_positions:
+            max_length = min(max_length, self.max_positions)
+        processors = LogitsProcessorList()
+        if self.no_repeat_ngram_size:
+            processors.append(IncrementalNoRepeatNGramLogitsProcessor(self.no_repeat_ngram_size))
+        if do_sample:
+            # Warpers validate their arguments, so a bad temperature fails here
+            if temperature is not None and temperature != 1.0:
+                processors.append(TemperatureLogitsWarper(temperature))
+            if self.top_k:
+                processors.append(TopKLogitsWarper(top_k=self.top_k))
+            if self.top_p is not None and self.top_p < 1.0:
+                processors.append(TopPLogitsWarper(top_p=self.top_p))
+        request = GenerationRequest(input_ids, max_length, do_sample, processors, streamer)
+        if streamer is not None:
+            streamer.put(torch.tensor([request.ids]))
+
+        with self._condition:
+            # Started on first use so a preforking server starts it in each worker.
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="generate-engine", daemon=True)
+                self._thread.start()
+            self._pending.append(request)
+            self._condition.notify()
+        with self._stats_lock:
+            self.requests += 1
+        return request
+
+    def generate(self, input_ids, **kwargs):
+        """Submit a prompt and wait for its token ids."""
+        return self.submit(input_ids, **kwargs).result()
+
+    def _run(self):
+        with torch.no_grad():
+            while True:
+                try:
+                    self._admit()
+                except Exception as e:
+                    self._fail(self._running, e, "Admitting to the batch")
+                if not self._running:
+                    continue
+                started = time.perf_counter()
+                try:
+                    self._step()
+                except Exception as e:
+                    self._fail(self._running, e, "Generation step")
+                with self._stats_lock:
+                    self.busy_seconds += time.perf_counter() - started
+
+    def _fail(self, requests, error, stage):
+        """Finish requests with an error and drop the batch state"""
+        logger.error(f"{stage} failed for {len(requests)} sequences: {str(error)}")
+        for request in requests:
+            if not request.done():
+                request._finish(error)
+        with self._stats_lock:
+            self.failed += len(requests)
+        self._running, self._past, self._mask = [], None, None
+
+    def _admit(self):
+        """Prefill waiting prompts into free batch rows; blocks while there is nothing to do."""
+        while len(self._running) < self.max_batch_size:
+            with self._condition:
+                while not self._pending and not self._running:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                request = self._pending.popleft()
+            if request.cancelled:
+                self._retire(request)
+                continue
+
+            started = time.perf_counter()
+            try:
+                past, logits = self._prefill(request.ids)
+                self._append_token(request, logits)
+            except Exception as e:
+                logger.error(f"Prefill failed: {str(e)}")
+                with self._stats_lock:
+                    self.failed += 1
+                request._finish(e)
+                continue
+            finally:
+                with self._stats_lock:
+                    self.busy_seconds += time.perf_counter() - started
+            try:
+                if self._finished(request):
+                    self._retire(request)
+                else:
+                    self._join(request, past)
+            except Exception as e:
+                # The batch cache may be half joined, so every running sequence fails with it
+                affected = [running for running in self._running if running is not request] + [request]
+                self._fail(affected, e, "Joining the batch")
+
+    def _prefill(self, ids):
+        """Cache and next-token logits of a prompt on its own, reusing cached prefix blocks"""
+        if self.prefix_cache is None:
+            outputs = self.model(input_ids=torch.tensor([ids]), use_cache=True)
+            return outputs.past_key_values, outputs.logits[:, -1, :]
+
+        cached, past = self.prefix_cache.lookup(ids)
+        outputs = self.model(
+            input_ids=torch.tensor([ids[cached:]]),
+            past_key_values=past,
+            position_ids=torch.arange(cached, len(ids)).unsqueeze(0),
+            use_cache=True
+        )
+        self.prefix_cache.store(ids, outputs.past_key_values, cached)
+        return outputs.past_key_values, outputs.logits[:, -1, :]
+
+    def _join(self, request, past):
+        """Add a prefilled sequence as a new row of the batch cache"""
+        length = past[0][0].shape[2]
+        mask = torch.ones(1, length, dtype=torch.long)
+        if self._past is None:
+            self._running, self._past, self._mask = [request], past, mask
+            return
+
+        batch_length = self._mask.shape[1]
+        if length < batch_length:
+            past = self._pad_past(past, batch_length - length)
+            mask = torch.cat([mask.new_zeros(1, batch_length - length), mask], dim=1)
+        elif length > batch_length:
+            self._past = self._pad_past(self._past, length - batch_length)
+            self._mask = torch.cat([self._mask.new_zeros(self._mask.shape[0], length - batch_length), self._mask], dim=1)
+        self._past = tuple(
+            (torch.cat([key, new_key]), torch.cat([value, new_value]))
+            for (key, value), (new_key, new_value) in zip(self._past, past)
+        )
+        self._mask = torch.cat([self._mask, mask])
+        self._running.append(request)
+
+    @staticmethod
+    def _pad_past(past, padding):
+        """Left pad every cache tensor along the sequence axis"""
+        return tuple(
+            (torch.cat([key.new_zeros(*key.shape[:2], padding, key.shape[3]), key], dim=2),
+             torch.cat([value.new_zeros(*value.shape[:2], padding, value.shape[3]), value], dim=2))
+            for key, value in past
+        )
+
+    def _step(self):
+        """Decode one token for every running sequence in one forward pass"""
+        batch_size = len(self._running)
+        input_ids = torch.tensor([[request.ids[-1]] for request in self._running])
+        # The last token of each row is not cached yet; its position is the row's cached length
+        position_ids = self._mask.sum(dim=1, keepdim=True)
+        mask = torch.cat([self._mask, self._mask.new_ones(batch_size, 1)], dim=1)
+        outputs = self.model(
+            input_ids=input_ids,
+            past_key_values=self._past,
+            attention_mask=mask,
+            position_ids=position_ids,
+            use_cache=True
+        )
+        self._past, self._mask = outputs.past_key_values, mask
+        logits = outputs.logits[:, -1, :]
+        for row, request in enumerate(self._running):
+            self._append_token(request, logits[row:row + 1])
+        with self._stats_lock:
+            self.steps += 1
+            self.step_sequences += batch_size
+            self.max_batch_seen = max(self.max_batch_seen, batch_size)
+
+        keep = [row for row, request in enumerate(self._running) if not self._finished(request)]
+        if len(keep) == batch_size:
+            return
+        for request in self._running:
+            if self._finished(request):
+                self._retire(request)
+        if not keep:
+            self._running, self._past, self._mask = [], None, None
+            return
+
+        index = torch.tensor(keep)
+        self._running = [self._running[row] for row in keep]
+        self._mask = self._mask.index_select(0, index)
+        # Drop the padding columns no remaining row needs
+        start = int(self._mask.any(dim=0).nonzero()[0])
+        self._mask = self._mask[:, start:]
+        self._past = tuple(
+            (key.index_select(0, index)[:, :, start:], value.index_select(0, index)[:, :, start:])
+            for key, value in self._past
+        )
+
+    def _append_token(self, request, logits):
+        """Choose the next token of a sequence from its logits"""
+        scores = request.processors(request.token_ids, logits.float())
+        if request.do_sample:
+            token = int(torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1))
+        else:
+            token = int(torch.argmax(scores, dim=-1))
+        request.append(token)
+        if request.streamer is not None:
+            request.streamer.put(torch.tensor([token]))
+        with self._stats_lock:
+            self.tokens += 1
+
+    def _finished(self, request):
+        return (
+            request.cancelled
+            or len(request.ids) >= request.max_length
+            or request.ids[-1] in self.eos_token_ids
+        )
+
+    def _retire(self, request):
+        with self._stats_lock:
+            if request.cancelled:
+                self.cancelled += 1
+            else:
+                self.completed += 1
+        request._finish()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "running": len(self._running),
+                "pending": len(self._pending),
+                "max_batch_size": self.max_batch_size,
+                "requests": self.requests,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "failed": self.failed,
+                "steps": self.steps,
+                "tokens": self.tokens,
+                "mean_batch_size": round(self.step_sequences / self.steps, 2) if self.steps else 0.0,
+                "max_batch_seen": self.max_batch_seen,
+                "tokens_per_second": round(self.tokens / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+                "prefix_cache": self.prefix_cache.stats() if self.prefix_cache is not None else None
+            }
@@ -0,0 +1,67 @@
+"""
+Torch-free app for deployments that only serve /lemmatize and /stemmer.
+
+It registers the same rule-based routes as app.py, with the same request and
+response contract, but never imports torch or transformers, so a worker starts
+in milliseconds and stays in the tens of MB. The torch-backed endpoints answer
+404 "Endpoint disabled", as they do in app.py when excluded by ENABLED_MODELS.
+"""
+from flask import Flask, jsonify
+from flask_cors import CORS
+import logging
+import os
+
+from model_registry import ModelRegistry, parse_enabled_models
+import rule_based
+
+logger = logging.getLogger(__name__)
+
+TORCH_MODELS = ("generate", "ner", "aspect")
+
+
+def create_app(enabled_models=None):
+    """
+    Build the rule-based app.
+
+    enabled_models defaults to ENABLED_MODELS from the environment, limited to
+    lemmatize and stemmer; both when it is not set.
+    """
+    if enabled_models is None:
+        enabled_models = os.environ.get("ENABLED_MODELS", ",".join(rule_based.RULE_BASED_MODELS))
+    if isinstance(enabled_models, str):
+        enabled_models = parse_enabled_models(enabled_models, rule_based.RULE_BASED_MODELS)
+
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for all routes
+
+    models = ModelRegistry()
+    app.config["ENABLED_MODELS"] = [name for name in rule_based.RULE_BASED_MODELS if name in enabled_models]
+    app.extensions["models"] = models
+    app.register_blueprint(rule_based.rule_based_routes)
+    rule_based.register_error_handlers(app)
+    rule_based.register_models(models, app.config["ENABLED_MODELS"])
+
+    @app.route('/')
+    def index():
+        """Root route for SSL certificate verification and service identification"""
+        return rule_based.service_index()
+
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        """Health check endpoint"""
+        return jsonify(rule_based.health_status())
+
+    @app.route('/model-info', methods=['GET'])
+    def model_info():
+        """Get information about the enabled models"""
+        info = rule_based.rule_based_model_info()
+        info["enabled_models"] = app.config["ENABLED_MODELS"]
+        return jsonify(info)
+
+    for name in TORCH_MODELS:
+        app.add_url_rule(
+            f"/{name}", f"{name}_disabled", lambda name=name: rule_based.model_disabled(name), methods=['POST']
+        )
+
+    logger.info(f"Rule-based app serving {', '.join(app.config['ENABLED_MODELS']) or 'no models'}")
+    return app
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for one model and runs them as a single batch.
+
+    A request submits a list of items and gets a Future for their results. A
+    background thread takes the oldest waiting request and calls `func` once
+    with the items of all collected requests; `func` maps a list of items to a
+    list of results of the same length. A request that finds no other one
+    waiting runs at once. When several are waiting, typically those that came
+    in while the previous batch ran, the thread keeps collecting until
+    max_wait_ms has passed since the oldest arrived or max_batch_items items
+    are waiting.
+
+    A request larger than max_batch_items runs as a batch of its own. If a
+    batch of several requests fails, each request is retried on its own, so
+    one bad input only fails its own request.
+    """
+
+    def __init__(self, name, func, max_batch_items=32, max_wait_ms=5):
+        self.name = name
+        self.func = func
+        self.max_batch_items = max(1, max_batch_items)
+        self.max_wait_ms = max(0, max_wait_ms)
+        self._queue = deque()  # (items, future, enqueued at)
+        self._queued_items = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self.requests = 0
+        self.batches = 0
+        self.items = 0
+        self.max_batch_size = 0
+        self.last_batch_size = 0
+        self.failed_batches = 0
+        self.wait_seconds = 0.0
+
+    def submit(self, items):
+        """Queue a list of items; the Future resolves to their results in input order."""
+        items = list(items)
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        with self._condition:
+            # Started on first use so a preforking server starts it in each worker.
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"batch-{self.name}", daemon=True)
+                self._thread.start()
+            self._queue.append((items, future, time.perf_counter()))
+            self._queued_items += len(items)
+            self._condition.notify()
+        return future
+
+    def __call__(self, items):
+        """Submit items and wait for their results."""
+        return self.submit(items).result()
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+            # A lone request does not wait out the window for company that may never come
+            deadline = self._queue[0][2] + self.max_wait_ms / 1000
+            while len(self._queue) > 1 and self._queued_items < self.max_batch_items:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = [self._queue.popleft()]
+            size = len(batch[0][0])
+            while self._queue and size + len(self._queue[0][0]) <= self.max_batch_items:
+                batch.append(self._queue.popleft())
+                size += len(batch[-1][0])
+            self._queued_items -= size
+            return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._next_batch()
+            started = time.perf_counter()
+            with self._condition:
+                self.requests += len(batch)
+                self.batches += 1
+                self.items += size
+                self.max_batch_size = max(self.max_batch_size, size)
+                self.last_batch_size = size
+                self.wait_seconds += sum(started - enqueued for _, _, enqueued in batch)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        try:
+            results = self.func([item for items, _, _ in batch for item in items])
+            if len(results) != sum(len(items) for items, _, _ in batch):
+                raise ValueError(f"{self.name} batch returned {len(results)} results for {sum(len(items) for items, _, _ in batch)} items")
+        except Exception as e:
+            with self._condition:
+                self.failed_batches += 1
+            if len(batch) > 1:
+                logger.warning(f"{self.name} batch of {len(batch)} requests failed, retrying them one by one: {str(e)}")
+                for request in batch:
+                    self._run_batch([request])
+            else:
+                batch[0][1].set_exception(e)
+            return
+
+        start = 0
+        for items, future, _ in batch:
+            future.set_result(results[start:start + len(items)])
+            start += len(items)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "queue_depth": len(self._queue),
+                "queued_items": self._queued_items,
+                "max_batch_items": self.max_batch_items,
+                "max_wait_ms": self.max_wait_ms,
+                "requests": self.requests,
+                "batches": self.batches,
+                "items": self.items,
+                "failed_batches": self.failed_batches,
+                "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "mean_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "last_batch_size": self.last_batch_size,
+                "mean_wait_ms": round(1000 * self.wait_seconds / self.requests, 2) if self.requests else 0.0
+            }
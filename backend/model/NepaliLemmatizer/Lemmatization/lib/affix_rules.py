@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+from typing import Tuple, List, Iterable, Optional
+
+
+class AffixRule(object):
+    """
+    One SFX line of the affix file, parsed once:
+    SFX <rule number> <strip> <affix>/<flags> <ending condition> [morph]
+    """
+
+    __slots__ = ('number', 'strip', 'affix', 'ending', 'negated', 'fields')
+
+    def __init__(self, fields: Tuple[str, ...]):
+        self.fields = fields
+        self.number = fields[1]
+        strip = fields[2]
+        # strip 0 means nothing is removed from the root before adding the affix
+        self.strip = '' if strip.isdigit() and int(strip) == 0 else strip
+        self.affix = fields[3].strip().split('/')[0]
+        self.ending, self.negated = self.compile_ending(fields[4])
+
+    @staticmethod
+    def compile_ending(ending: str) -> Tuple[Optional[frozenset], bool]:
+        """
+        compile the ending condition to a set of allowed (or denied) last characters
+        :param ending: ., ्, [िइ] or [^उइि्]
+        :return: (characters, negated); characters is None when any ending is allowed
+        """
+        if ending == '.':
+            return None, False
+        chars = ending.replace('[', '').replace(']', '')
+        # a blank condition (double space in the affix file) allows no ending at all
+        return frozenset(chars), chars[:1] == '^'
+
+    def allows(self, token: str) -> bool:
+        """
+        check if the ending condition of the rule holds for token
+        """
+        if self.ending is None:
+            return True
+        if self.negated:
+            return token[-1:] not in self.ending
+        return token[-1:] in self.ending
+
+    def apply(self, token: str) -> Optional[str]:
+        """
+        make word from a root using this rule
+        :param token: root word
+        :return: word made from the root, None if the root does not satisfy the ending condition
+        """
+        if not self.allows(token):
+            return None
+        if not self.strip:
+            return token + self.affix
+        return token[:-len(self.strip)] + self.affix
+
+    def __repr__(self):
+        return 'AffixRule{}'.format(self.fields)
+
+
+class AffixRuleTable(object):
+    """
+    Affix rules compiled once, indexed by rule number and by a reverse trie on the affix,
+    so the rules able to produce a surface ending are found by walking the word from its end.
+    """
+
+    def __init__(self, lines: Iterable[Tuple[str, ...]]):
+        self.rules = []
+        self.by_number = {}
+        # reverse trie: char -> (children, rules whose affix ends at this node)
+        self.suffix_trie = ({}, [])
+        for fields in lines:
+            # header lines: SFX <number> Y <count>
+            if len(fields) < 5 or fields[2] == 'Y':
+                continue
+            rule = AffixRule(fields)
+            self.rules.append(rule)
+            self.by_number.setdefault(rule.number, []).append(rule)
+            node = self.suffix_trie
+            for char in reversed(rule.affix):
+                node = node[0].setdefault(char, ({}, []))
+            node[1].append(rule)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def rules_for_numbers(self, rule_numbers: Iterable[str]) -> List[AffixRule]:
+        """
+        :param rule_numbers: ['15', '22', '8', '43']
+        :return: all rules with the given numbers
+        """
+        return [rule for number in set(rule_numbers) for rule in self.by_number.get(number, ())]
+
+    def matching_rules(self, word: str, rule_numbers: Iterable[str] = None) -> List[AffixRule]:
+        """
+        find the rules whose affix is an ending of word, longest affix first
+        :param word: word to lemmatize, हेराइदिँदा
+        :param rule_numbers: keep only these rule numbers when given
+        :return: list of rules
+        """
+        if rule_numbers is not None:
+            rule_numbers = set(rule_numbers)
+        node = self.suffix_trie
+        found = [node[1]]
+        for char in reversed(word):
+            node = node[0].get(char)
+            if node is None:
+                break
+            found.append(node[1])
+        matched = []
+        for rules in reversed(found):
+            for rule in rules:
+                if rule_numbers is None or rule.number in rule_numbers:
+                    matched.append(rule)
+        return matched
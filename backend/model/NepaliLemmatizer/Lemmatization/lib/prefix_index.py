@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left
+from typing import Tuple, List, Set, Iterable, Sequence
+
+# Sorts after every character a root word can contain, so that
+# [prefix, prefix + _MAX_CHAR) covers exactly the words starting with prefix.
+_MAX_CHAR = '\U0010ffff'
+
+
+class PrefixIndex(object):
+    """
+    Sorted array over the root words that carry word formation rules.
+    Every word starting with a prefix lies in one contiguous range, found with two bisects.
+    """
+
+    def __init__(self, root_table: Iterable[Tuple[str, str, List[str]]]):
+        entries = sorted(((word, rules) for word, _, rules in root_table if rules), key=lambda entry: entry[0])
+        self.words = [word for word, _ in entries]
+        self.rules = [rules for _, rules in entries]
+
+    @classmethod
+    def from_arrays(cls, words: Sequence[str], rules: Sequence[List[str]]) -> 'PrefixIndex':
+        """
+        wrap already sorted word and rule arrays, e.g. the ones of a lexicon snapshot
+        """
+        index = cls.__new__(cls)
+        index.words = words
+        index.rules = rules
+        return index
+
+    def __len__(self):
+        return len(self.words)
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """
+        :param prefix: prefix of the word, हेरा
+        :return: (start, end) positions of the words starting with prefix
+        """
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + _MAX_CHAR, start)
+        return start, end
+
+    def words_starting_with(self, prefix: str, max_length: int) -> Tuple[Set[str], List[Tuple[str, List[str]]]]:
+        """
+        get the words starting with prefix, no longer than max_length, along with their rules
+        :param prefix: prefix of the word to be lemmatized, सम्बन्ध
+        :param max_length: length of the word to be lemmatized
+        :return: union of the rules of all words found, list of (word, rules)
+        """
+        rules_only = set()
+        words = list()
+        start, end = self.prefix_range(prefix)
+        for i in range(start, end):
+            word = self.words[i]
+            if len(word) <= max_length:
+                rules = self.rules[i]
+                rules_only.update(rules)
+                words.append((word, rules))
+        return rules_only, words
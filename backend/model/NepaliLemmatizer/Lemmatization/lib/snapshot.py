@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Versioned binary snapshot of the lemmatizer lexicon.
+
+The trie and the prefix index are flattened into fixed width arrays that are
+used straight from a read only memory map, so every worker process reading the
+same snapshot shares its pages through the OS page cache instead of holding a
+private copy. The small tables (rule sets, POS tags, affix rules) are stored as
+JSON sections.
+
+Layout:
+  magic (8 bytes) | header length (uint32, little endian) | JSON header | sections
+The header carries the format version, the checksums of the source files and
+the (offset, length, type) of every section. Sections start on 8 byte boundaries;
+their offsets count from the first one, right after the padded header.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Optional
+
+from Lemmatization.lib.prefix_index import PrefixIndex
+from Lemmatization.lib.trie_v2 import Trie
+
+MAGIC = b'NPLEXSNP'
+VERSION = 1
+_HEADER_LENGTH = struct.Struct('<I')
+# a word node stores the id of its rule set + 1, 0 means the node does not finish a word
+_NOT_A_WORD = 0
+# type of every section a snapshot holds, in file order
+_SECTION_KINDS = {
+    'trie_chars': 'I', 'trie_child_start': 'I', 'trie_counters': 'I', 'trie_rules': 'I', 'trie_pos': 'I',
+    'prefix_words': 'B', 'prefix_offsets': 'I', 'prefix_rules': 'I',
+    'rule_sets': 'json', 'pos_tags': 'json', 'affix_rules': 'json',
+}
+_ITEM_SIZES = {'I': 4, 'B': 1, 'json': 1}
+
+
+def _uint32_array(values) -> array:
+    data = array('I', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+
+class _StringArray(object):
+    """
+    Read only sequence of strings stored as one utf-8 blob plus offsets.
+    utf-8 keeps code point order, so a sorted array can be bisected directly.
+    """
+
+    def __init__(self, blob: memoryview, offsets: memoryview):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+
+class _TupleArray(object):
+    """
+    Read only sequence mapping ids stored in an array to shared tuples.
+    """
+
+    def __init__(self, ids: memoryview, values: List[Tuple[str, ...]]):
+        self.ids = ids
+        self.values = values
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i: int) -> Tuple[str, ...]:
+        return self.values[self.ids[i]]
+
+
+class MappedTrie(object):
+    """
+    Trie flattened in breadth first order: the children of node i are the nodes
+    child_start[i] .. child_start[i + 1] - 1, sorted by character, so a transition
+    is a bisect over a handful of entries. Same add-free interface as trie_v2.Trie.
+    """
+
+    def __init__(self, chars: memoryview, child_start: memoryview, counters: memoryview,
+                 rules: memoryview, pos: memoryview, rule_sets: List[Tuple[str, ...]], pos_tags: List[str]):
+        self.chars = chars
+        self.child_start = child_start
+        self.counters = counters
+        self.rules = rules
+        self.pos = pos
+        self.rule_sets = rule_sets
+        self.pos_tags = pos_tags
+
+    def __len__(self):
+        return len(self.chars)
+
+    def _child(self, node: int, char: str) -> int:
+        lo, hi = self.child_start[node], self.child_start[node + 1]
+        code = ord(char)
+        i = bisect_left(self.chars, code, lo, hi)
+        if i < hi and self.chars[i] == code:
+            return i
+        return -1
+
+    def _has_children(self, node: int) -> bool:
+        return self.child_start[node] != self.child_start[node + 1]
+
+    def node_rules(self, node: int) -> Tuple[str, ...]:
+        rule_set = self.rules[node]
+        return self.rule_sets[rule_set - 1] if rule_set != _NOT_A_WORD else ()
+
+    def node_pos(self, node: int) -> str:
+        return self.pos_tags[self.pos[node]]
+
+    def find(self, prefix: str) -> Tuple[bool, int]:
+        """
+        same semantics as trie_v2.find
+        """
+        node = 0
+        if not self._has_children(0):
+            return False, 0
+        for idx, char in enumerate(prefix):
+            child = self._child(node, char)
+            if child != -1:
+                node = child
+            if self.rules[node] != _NOT_A_WORD and idx < (len(prefix) - 1) and not self._has_children(node):
+                return False, 0
+            if child == -1:
+                return False, 0
+        return True, self.counters[node]
+
+    def find_prefix(self, prefix: str) -> Tuple[bool, int, tuple, list]:
+        """
+        same semantics as trie_v2.find_prefix
+        """
+        node = 0
+        longest = []
+        if not self._has_children(0):
+            return False, 1, tuple(), []
+        last = len(prefix) - 1
+        for idx, char in enumerate(prefix):
+            child = self._child(node, char)
+            if child != -1:
+                node = child
+                if self.rules[node] != _NOT_A_WORD:
+                    longest = (prefix[:idx + 1], self.node_rules(node))
+            word_finished = self.rules[node] != _NOT_A_WORD
+            if word_finished and idx < last and not self._has_children(node):
+                return False, 2, longest, []
+            if child == -1:
+                return False, 3, longest, []
+            if idx == last and not word_finished:
+                return False, 4, longest, []
+        return True, 5 + self.counters[node], longest, []
+
+
+class Snapshot(object):
+    """
+    An open snapshot. Keeps the memory map alive as long as the lexicon is used.
+    """
+
+    def __init__(self, path: str, mapped: mmap.mmap, header: dict, data_start: int):
+        self.path = path
+        self.header = header
+        self.size = len(mapped)
+        self._mmap = mapped
+        self._view = memoryview(mapped)[data_start:]
+
+    def section(self, name: str):
+        offset, length, kind = self.header['sections'][name]
+        view = self._view[offset:offset + length]
+        if kind == 'json':
+            return json.loads(bytes(view).decode('utf-8'))
+        if kind == 'I' and sys.byteorder != 'little':
+            # big endian hosts cannot use the little endian arrays in place
+            data = array('I', bytes(view))
+            data.byteswap()
+            return memoryview(data)
+        return view.cast(kind)
+
+    def trie(self) -> MappedTrie:
+        return MappedTrie(self.section('trie_chars'), self.section('trie_child_start'),
+                          self.section('trie_counters'), self.section('trie_rules'), self.section('trie_pos'),
+                          [tuple(rules) for rules in self.section('rule_sets')], self.section('pos_tags'))
+
+    def prefix_index(self) -> PrefixIndex:
+        rule_sets = [tuple(rules) for rules in self.section('rule_sets')]
+        words = _StringArray(self.section('prefix_words'), self.section('prefix_offsets'))
+        return PrefixIndex.from_arrays(words, _TupleArray(self.section('prefix_rules'), rule_sets))
+
+    def affix_rules(self) -> List[Tuple[str, ...]]:
+        return [tuple(fields) for fields in self.section('affix_rules')]
+
+
+def _flatten_trie(trie: Trie, rule_set_ids: Dict[Tuple[str, ...], int], pos_ids: Dict[str, int]):
+    chars, child_start, counters, rules, pos = [0], [], [trie.root.counter], [_NOT_A_WORD], [0]
+    queue = [trie.root]
+    next_id = 1
+    # breadth first, so the children of every node get consecutive ids
+    for node in queue:
+        child_start.append(next_id)
+        children = sorted(node.children.items()) if node.children else []
+        for char, child in children:
+            chars.append(ord(char))
+            counters.append(child.counter)
+            rules.append(rule_set_ids.setdefault(child.rules, len(rule_set_ids)) + 1
+                         if child.word_finished else _NOT_A_WORD)
+            pos.append(pos_ids.setdefault(child.pos or '', len(pos_ids)))
+            queue.append(child)
+        next_id += len(children)
+    child_start.append(next_id)
+    return chars, child_start, counters, rules, pos
+
+
+def write_snapshot(path: str, sources: Dict[str, str], trie: Trie, prefix_index: PrefixIndex,
+                   affix_rules: List[Tuple[str, ...]]) -> int:
+    """
+    serialize the lexicon to path, atomically replacing any older snapshot
+    :param sources: checksums of the files the lexicon was built from
+    :return: size of the snapshot in bytes
+    """
+    rule_set_ids = {}
+    pos_ids = {'': 0}
+    chars, child_start, counters, rules, pos = _flatten_trie(trie, rule_set_ids, pos_ids)
+
+    encoded = [word.encode('utf-8') for word in prefix_index.words]
+    offsets = [0]
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    prefix_rules = [rule_set_ids.setdefault(tuple(rules), len(rule_set_ids)) for rules in prefix_index.rules]
+
+    def json_section(value):
+        return json.dumps(value, ensure_ascii=False).encode('utf-8'), 'json'
+
+    sections = [
+        ('trie_chars', _uint32_array(chars).tobytes(), 'I'),
+        ('trie_child_start', _uint32_array(child_start).tobytes(), 'I'),
+        ('trie_counters', _uint32_array(counters).tobytes(), 'I'),
+        ('trie_rules', _uint32_array(rules).tobytes(), 'I'),
+        ('trie_pos', _uint32_array(pos).tobytes(), 'I'),
+        ('prefix_words', b''.join(encoded), 'B'),
+        ('prefix_offsets', _uint32_array(offsets).tobytes(), 'I'),
+        ('prefix_rules', _uint32_array(prefix_rules).tobytes(), 'I'),
+        ('rule_sets', ) + json_section([list(rules) for rules, _ in sorted(rule_set_ids.items(), key=lambda i: i[1])]),
+        ('pos_tags', ) + json_section([tag for tag, _ in sorted(pos_ids.items(), key=lambda i: i[1])]),
+        ('affix_rules', ) + json_section([list(fields) for fields in affix_rules]),
+    ]
+
+    layout, position = {}, 0
+    for name, data, kind in sections:
+        layout[name] = [position, len(data), kind]
+        position += len(data) + (-len(data) % 8)
+    header_bytes = json.dumps({'version': VERSION, 'sources': sources, 'sections': layout},
+                              sort_keys=True).encode('utf-8')
+
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (-f.tell() % 8))
+        for name, data, _ in sections:
+            f.write(data)
+            f.write(b'\0' * (-len(data) % 8))
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def _check_sections(header: dict, data_length: int):
+    """
+    raise ValueError unless every section lies inside the data that follows the
+    header, starts on an 8 byte boundary and holds whole items of its type, and
+    the trie arrays agree in length; a truncated or partly written snapshot fails
+    :param data_length: bytes from the first section to the end of the file
+    """
+    sections = header.get('sections')
+    if not isinstance(sections, dict):
+        raise ValueError('snapshot header has no sections')
+    lengths = {}
+    for name, kind in _SECTION_KINDS.items():
+        section = sections.get(name)
+        if (not isinstance(section, list) or len(section) != 3 or section[2] != kind
+                or not all(isinstance(value, int) and value >= 0 for value in section[:2])):
+            raise ValueError('snapshot section {} is malformed'.format(name))
+        offset, length, _ = section
+        if offset % 8 or length % _ITEM_SIZES[kind]:
+            raise ValueError('snapshot section {} is misaligned'.format(name))
+        if offset + length > data_length:
+            raise ValueError('snapshot section {} runs past the end of the file'.format(name))
+        lengths[name] = length
+    nodes = lengths['trie_chars']
+    if (nodes == 0 or lengths['trie_child_start'] != nodes + 4
+            or not lengths['trie_counters'] == lengths['trie_rules'] == lengths['trie_pos'] == nodes
+            or lengths['prefix_offsets'] != lengths['prefix_rules'] + 4):
+        raise ValueError('snapshot sections do not agree in length')
+
+
+def open_snapshot(path: str, sources: Dict[str, str] = None) -> Optional[Snapshot]:
+    """
+    memory map a snapshot
+    :param sources: expected checksums of the source files, skipped when not given
+    :return: the snapshot, None when it is missing, truncated, of another version or built from other sources
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    header_start = len(MAGIC) + _HEADER_LENGTH.size
+    try:
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError('not a lexicon snapshot')
+        header_length, = _HEADER_LENGTH.unpack(mapped[len(MAGIC):header_start])
+        if header_start + header_length > len(mapped):
+            raise ValueError('snapshot header runs past the end of the file')
+        header = json.loads(mapped[header_start:header_start + header_length].decode('utf-8'))
+        if not isinstance(header, dict):
+            raise ValueError('snapshot header is not an object')
+        if header.get('version') != VERSION or (sources is not None and header.get('sources') != sources):
+            raise ValueError('snapshot is stale')
+        data_start = header_start + header_length
+        data_start += -data_start % 8
+        _check_sections(header, len(mapped) - data_start)
+    except (struct.error, ValueError):
+        mapped.close()
+        return None
+    return Snapshot(path, mapped, header, data_start)
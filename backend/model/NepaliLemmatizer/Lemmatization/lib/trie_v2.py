@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import sys
+from typing import Tuple, List
+
+
+class TrieNode(object):
+    """
+    Compact trie node: children are kept in a dict keyed by character so every
+    transition is O(1), and __slots__ drops the per node __dict__.
+    Leaf nodes keep children as None instead of an empty dict.
+    """
+
+    __slots__ = ('char', 'children', 'word_finished', 'counter', 'pos', 'rules')
+
+    def __init__(self, char: str):
+        self.char = char
+        self.children = None
+        # Is it the last character of the word.
+        self.word_finished = False
+        # How many times this character appeared in the addition process
+        self.counter = 1
+        self.pos = None
+        self.rules = ()
+
+    def pprint(self, indent="", last=True, stack=""):
+        if indent != "":
+            stack = stack + self.char
+
+        sys.stdout.write(indent)
+        if last:
+            sys.stdout.write("┗╾")
+            indent += "  "
+        else:
+            sys.stdout.write("┣╾")
+            indent += "┃ "
+
+        sys.stdout.write("{} ({})".format(self.char, self.counter))
+        if self.word_finished:
+            print(" - {}".format(stack))
+        else:
+            print()
+
+        children = list(self.children.values()) if self.children else []
+        for i, c in enumerate(children):
+            c.pprint(indent, i == len(children) - 1, stack)
+
+
+class Trie(object):
+    """
+    Root node plus the table of interned rule tuples. Most roots share one of a
+    few hundred distinct rule lists, so every word node points to a shared tuple.
+    """
+
+    def __init__(self):
+        self.root = TrieNode('*')
+        self.interned_rules = {}
+
+    def add(self, word: str, rules: List[str] = None, pos: str = None) -> None:
+        rules = tuple(rules or ())
+        add(self.root, word, self.interned_rules.setdefault(rules, rules), pos)
+
+    def find(self, prefix: str) -> Tuple[bool, int]:
+        return find(self.root, prefix)
+
+    def find_prefix(self, prefix: str) -> Tuple[bool, int, tuple, list]:
+        return find_prefix(self.root, prefix)
+
+
+def add(root: TrieNode, word: str, rules: Tuple[str, ...] = None, pos: str = None) -> None:
+    """
+    Adding a word in the trie structure
+    """
+    node = root
+    for char in word:
+        if node.children is None:
+            node.children = {}
+        child = node.children.get(char)
+        if child is not None:
+            # Another word has this char as well
+            child.counter += 1
+        else:
+            child = node.children[char] = TrieNode(char)
+        node = child
+    # Everything finished. Mark it as the end of a word.
+    node.word_finished = True
+    node.rules = rules or ()
+    node.pos = pos or ''
+
+
+def find(root: TrieNode, prefix: str) -> Tuple[bool, int]:
+    """
+    Check and return
+      1. If the prefix exists in any of the words we added so far
+      2. If yes then how may words actually have the prefix
+    """
+    node = root
+    if not root.children:
+        return False, 0
+    for idx, char in enumerate(prefix):
+        child = node.children.get(char) if node.children else None
+        if child is not None:
+            node = child
+        # Reached the end of a word while the prefix string is not exhausted.
+        if node.word_finished and idx < (len(prefix) - 1) and not node.children:
+            return False, 0
+        if child is None:
+            return False, 0
+    return True, node.counter
+
+
+def find_prefix(root: TrieNode, prefix: str) -> Tuple[bool, int, tuple, list]:
+    """
+    Check and return
+      1. If the prefix is a word we added so far
+      2. A status code: 1 empty trie, 2 word ended before the prefix, 3 char not found,
+         4 prefix is not a complete word, 5 + counter when found
+      3. The longest word on the path that is a prefix of the given one, with its rules
+    """
+    node = root
+    longest = []
+    if not root.children:
+        return False, 1, tuple(), []
+    last = len(prefix) - 1
+    for idx, char in enumerate(prefix):
+        child = node.children.get(char) if node.children else None
+        if child is not None:
+            node = child
+            if node.word_finished:
+                longest = (prefix[:idx + 1], node.rules)
+        if node.word_finished and idx < last and not node.children:
+            return False, 2, longest, []
+        if child is None:
+            return False, 3, longest, []
+        if idx == last and not node.word_finished:
+            return False, 4, longest, []
+    return True, 5 + node.counter, longest, []
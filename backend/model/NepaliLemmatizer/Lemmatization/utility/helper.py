@@ -16,6 +16,10 @@ def get_root_pos_rule_csv_path():
     return os.path.join(data_path, 'root_pos_rules.csv')
 
 
+def get_lexicon_snapshot_path():
+    return os.path.join(get_data_path(), 'lexicon.snapshot')
+
+
 def get_nepali_dict_path():
     return os.path.join(get_data_path(), 'original', 'ne_NP_original.dic')
 
@@ -0,0 +1,44 @@
+# encoding: utf8
+"""
+Run the recursive get_lemma and the iterative find_lemma over the gold corpus
+and report every word where the two lemmas differ.
+
+Usage: python benchmark/compare_lemma_algorithms.py
+"""
+
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Lemmatization.utility import helper  # noqa: E402
+from main import Lemmatizer, find_lemma, get_lemma  # noqa: E402
+
+
+def main():
+    engine = Lemmatizer(use_snapshot=False).load()
+    with open(helper.get_manually_annotated_corpus_file(), 'r') as f:
+        words = [row[0] for row in csv.reader(f) if row]
+
+    start = time.perf_counter()
+    recursive = [get_lemma(engine.trie, word, prefix_index=engine.prefix_index, rule_table=engine.rule_table)[2]
+                 for word in words]
+    recursive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    iterative = [find_lemma(engine.trie, word, engine.prefix_index, engine.rule_table,
+                            engine.max_work, engine.time_budget)[2] for word in words]
+    iterative_time = time.perf_counter() - start
+
+    differences = [(word, old, new) for word, old, new in zip(words, recursive, iterative) if old != new]
+    print('{} words: get_lemma {:.3f}s, find_lemma {:.3f}s'.format(len(words), recursive_time, iterative_time))
+    print('{} differences'.format(len(differences)))
+    for word, old, new in differences:
+        print('{}\tget_lemma={}\tfind_lemma={}'.format(word, old, new))
+    return 1 if differences else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
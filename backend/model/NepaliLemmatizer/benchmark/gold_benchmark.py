@@ -0,0 +1,186 @@
+# encoding: utf8
+"""
+Offline accuracy and throughput benchmark of the lemmatizer over the manually
+annotated gold corpus (surface word, lemma, rule).
+
+Reports accuracy, words/sec, p50/p99 per-word latency, peak RSS and cold-start
+time, and writes them as JSON so two runs can be compared.
+
+Usage:
+  python benchmark/gold_benchmark.py [--output results.json] [--compare baseline.json]
+                                     [--repeat 3] [--no-snapshot]
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# data_checksums, which the lexicon snapshot is keyed by, is shared with the stemmer one directory up
+MODEL_DIR = os.path.dirname(ROOT)
+sys.path.insert(0, ROOT)
+sys.path.append(MODEL_DIR)
+
+from Lemmatization.utility import helper  # noqa: E402
+
+# metrics where a smaller value is better, used to flag regressions in --compare
+LOWER_IS_BETTER = {'p50_latency_ms', 'p99_latency_ms', 'mean_latency_ms', 'peak_rss_mb',
+                   'cold_start_ms', 'import_ms', 'load_ms', 'total_seconds'}
+
+
+def read_gold_corpus():
+    with open(helper.get_manually_annotated_corpus_file(), 'r') as f:
+        return [(row[0], row[1]) for row in csv.reader(f) if len(row) >= 2]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure_cold_start(use_snapshot):
+    """
+    time importing the lemmatizer and loading its lexicon in a fresh interpreter
+    """
+    code = (
+        "import sys, time, json\n"
+        "sys.path.insert(0, {root!r})\n"
+        "sys.path.append({model_dir!r})\n"
+        "start = time.perf_counter()\n"
+        "import main\n"
+        "from data_checksums import source_checksums\n"
+        "imported = time.perf_counter()\n"
+        "main.Lemmatizer(use_snapshot={snapshot}).load(source_checksums(main.get_lexicon_sources()))\n"
+        "loaded = time.perf_counter()\n"
+        "print(json.dumps({{'import_ms': (imported - start) * 1000, 'load_ms': (loaded - imported) * 1000}}))\n"
+    ).format(root=ROOT, model_dir=MODEL_DIR, snapshot=use_snapshot)
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['cold_start_ms'] = timings['import_ms'] + timings['load_ms']
+    return timings
+
+
+def run(repeat, use_snapshot):
+    from data_checksums import source_checksums
+    from main import Lemmatizer, get_lexicon_sources
+
+    cold_start = measure_cold_start(use_snapshot)
+    engine = Lemmatizer(use_snapshot=use_snapshot).load(source_checksums(get_lexicon_sources()))
+    corpus = read_gold_corpus()
+
+    latencies = []
+    correct = 0
+    errors = []
+    start = time.perf_counter()
+    for iteration in range(repeat):
+        for word, gold in corpus:
+            word_start = time.perf_counter()
+            lemma = engine.lemmatize(word)
+            latencies.append(time.perf_counter() - word_start)
+            if iteration == 0:
+                if lemma == gold:
+                    correct += 1
+                else:
+                    errors.append({'word': word, 'expected': gold, 'got': lemma})
+    total = time.perf_counter() - start
+    latencies.sort()
+
+    return {
+        'words': len(corpus),
+        'repeat': repeat,
+        'snapshot': use_snapshot,
+        'accuracy': correct / len(corpus) if corpus else 0.0,
+        'correct': correct,
+        'words_per_sec': len(latencies) / total if total else 0.0,
+        'mean_latency_ms': total / len(latencies) * 1000 if latencies else 0.0,
+        'p50_latency_ms': percentile(latencies, 0.50) * 1000,
+        'p99_latency_ms': percentile(latencies, 0.99) * 1000,
+        'total_seconds': total,
+        'peak_rss_mb': peak_rss_mb(),
+        'import_ms': cold_start['import_ms'],
+        'load_ms': cold_start['load_ms'],
+        'cold_start_ms': cold_start['cold_start_ms'],
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'errors': errors,
+    }
+
+
+def print_results(results):
+    print('words          {}'.format(results['words']))
+    print('accuracy       {:.4f} ({}/{})'.format(results['accuracy'], results['correct'], results['words']))
+    print('words/sec      {:,.0f}'.format(results['words_per_sec']))
+    print('latency p50    {:.3f} ms'.format(results['p50_latency_ms']))
+    print('latency p99    {:.3f} ms'.format(results['p99_latency_ms']))
+    print('peak RSS       {:.1f} MB'.format(results['peak_rss_mb']))
+    print('cold start     {:.1f} ms (import {:.1f} ms, load {:.1f} ms)'.format(
+        results['cold_start_ms'], results['import_ms'], results['load_ms']))
+
+
+def compare(results, baseline):
+    """
+    print metric deltas against a previous run and the words whose lemma changed
+    :return: True when accuracy dropped
+    """
+    print('\n{:<16} {:>12} {:>12} {:>9}'.format('metric', 'baseline', 'current', 'change'))
+    for key in ('accuracy', 'words_per_sec', 'p50_latency_ms', 'p99_latency_ms',
+                'peak_rss_mb', 'cold_start_ms'):
+        old, new = baseline.get(key), results.get(key)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        worse = change > 0 if key in LOWER_IS_BETTER else change < 0
+        print('{:<16} {:>12.4f} {:>12.4f} {:>8.1f}%{}'.format(key, old, new, change, ' !' if worse and change else ''))
+
+    old_errors = {e['word']: e['got'] for e in baseline.get('errors', [])}
+    new_errors = {e['word']: e['got'] for e in results.get('errors', [])}
+    fixed = sorted(set(old_errors) - set(new_errors))
+    broken = sorted(set(new_errors) - set(old_errors))
+    if fixed:
+        print('\nfixed: {}'.format(', '.join(fixed)))
+    if broken:
+        print('\nbroken: {}'.format(', '.join('{} -> {}'.format(w, new_errors[w]) for w in broken)))
+    return results['accuracy'] < baseline.get('accuracy', 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare against')
+    parser.add_argument('--repeat', type=int, default=3, help='passes over the corpus for the timings')
+    parser.add_argument('--no-snapshot', action='store_true', help='build the lexicon from csv instead of the snapshot')
+    args = parser.parse_args()
+
+    results = run(max(1, args.repeat), not args.no_snapshot)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print('\nresults written to {}'.format(args.output))
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# encoding: utf8
+"""
+Compare memory and lookup speed of the list based trie (trie_v1) with the
+dict/__slots__ trie (trie_v2) over the root table.
+
+Usage: python benchmark/trie_comparison.py
+"""
+
+import csv
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Lemmatization.lib import trie_v1, trie_v2  # noqa: E402
+from Lemmatization.utility import helper  # noqa: E402
+from main import load_root_table  # noqa: E402
+
+
+def build_v1(root_table):
+    root = trie_v1.TrieNode('*')
+    for word, pos, rules in root_table:
+        trie_v1.add(root, word, rules, pos)
+    return root
+
+
+def build_v2(root_table):
+    trie = trie_v2.Trie()
+    for word, pos, rules in root_table:
+        trie.add(word, rules, pos)
+    return trie.root
+
+
+def measure_build(build, root_table):
+    tracemalloc.start()
+    start = time.perf_counter()
+    root = build(root_table)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return root, elapsed, current
+
+
+def measure_lookup(find, root, words, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for word in words:
+            find(root, word)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    root_table = load_root_table()
+    with open(helper.get_manually_annotated_corpus_file(), 'r') as f:
+        gold_words = [row[0] for row in csv.reader(f) if row]
+    words = [word for word, _, _ in root_table] + gold_words
+
+    rows = []
+    for name, build, find in (('trie_v1 (list children)', build_v1, trie_v1.find),
+                              ('trie_v2 (dict + __slots__)', build_v2, trie_v2.find)):
+        root, build_time, memory = measure_build(build, root_table)
+        lookup_time = measure_lookup(find, root, words)
+        rows.append((name, build_time, memory, lookup_time))
+        del root
+
+    print('{} roots, {} lookups'.format(len(root_table), len(words)))
+    print('{:<28} {:>10} {:>12} {:>14}'.format('structure', 'build (s)', 'memory (MB)', 'lookups/sec'))
+    for name, build_time, memory, lookup_time in rows:
+        print('{:<28} {:>10.3f} {:>12.1f} {:>14,.0f}'.format(
+            name, build_time, memory / 1024 / 1024, len(words) / lookup_time))
+
+
+if __name__ == '__main__':
+    main()
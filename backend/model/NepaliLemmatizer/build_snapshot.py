@@ -0,0 +1,23 @@
+# encoding: utf8
+"""
+Build the lexicon snapshot that the lemmatizer memory maps at startup.
+The runtime rebuilds it on its own when the source files change; running this
+at image build time saves the first worker from doing it.
+
+Usage: python build_snapshot.py [snapshot path]
+"""
+
+import os
+import sys
+
+# The data file checksums are shared with the stemmer, one directory up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_checksums import source_checksums  # noqa: E402
+from Lemmatization.utility import helper  # noqa: E402
+from main import build_lexicon_snapshot, get_lexicon_sources  # noqa: E402
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else helper.get_lexicon_snapshot_path()
+    size = build_lexicon_snapshot(source_checksums(get_lexicon_sources()), path)
+    print("Wrote lexicon snapshot {} ({:.1f} KB)".format(path, size / 1024))
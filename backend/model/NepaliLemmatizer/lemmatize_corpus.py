@@ -0,0 +1,164 @@
+# encoding: utf8
+"""
+Stream a large corpus through the lemmatizer.
+
+Reads plain text (one document per line) or JSONL line by line, lemmatizes
+every whitespace separated token with a bounded cache and writes one JSON
+object per input line as soon as it is done, so memory stays constant.
+
+A line that cannot be read or lemmatized (bad JSON, a record that is not an
+object, a text field that is not a string) is reported on stderr and written
+as {"error": ...} with its offsets, and the run goes on. Invalid UTF-8 is
+replaced rather than fatal.
+
+Every output object carries the byte offsets of its input line ("offset" and
+"next_offset"); --resume continues an interrupted run from the last line
+written, and --start-offset starts at any line boundary of the input.
+
+Usage:
+  python lemmatize_corpus.py news.txt -o news.lemmas.jsonl
+  python lemmatize_corpus.py dump.jsonl --format jsonl --field body -o out.jsonl --resume
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from functools import lru_cache
+
+from main import lemmatizer
+
+# output is read back from the end to resume; no line is expected to be longer than this
+_RESUME_TAIL_BYTES = 1 << 20
+
+
+def find_resume_offset(output_path: str) -> int:
+    """
+    :return: next_offset of the last complete line of a previous output, 0 when there is none.
+    A trailing partial line (interrupted write) is truncated away.
+    """
+    if not os.path.exists(output_path):
+        return 0
+    with open(output_path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - _RESUME_TAIL_BYTES))
+        tail = f.read()
+        tail_start = size - len(tail)
+        end = tail.rfind(b'\n')
+        if end == -1:
+            f.truncate(tail_start)
+            return 0
+        if end != len(tail) - 1:
+            f.truncate(tail_start + end + 1)
+        start = tail.rfind(b'\n', 0, end) + 1
+        return json.loads(tail[start:end].decode('utf-8'))['next_offset']
+
+
+def format_progress(done_bytes: int, total_bytes: int, lines: int, words: int, elapsed: float) -> str:
+    rate = done_bytes / elapsed / (1024 * 1024) if elapsed else 0.0
+    percent = ' ({:.1f}%)'.format(done_bytes / total_bytes * 100) if total_bytes else ''
+    return '{:,} lines, {:,} words, {:.1f} MB{} | {:,.0f} lines/s, {:,.0f} words/s, {:.2f} MB/s'.format(
+        lines, words, done_bytes / (1024 * 1024), percent,
+        lines / elapsed if elapsed else 0.0, words / elapsed if elapsed else 0.0, rate)
+
+
+def lemmatize_line(line: str, input_format: str, field: str, lemmatize):
+    """
+    :return: (output record, tokens) for one input line
+    :raises ValueError: when a JSONL line is not an object or its field is not a string
+    """
+    if input_format == 'jsonl':
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError('expected a JSON object, got {}'.format(type(record).__name__))
+        text = record.get(field) or ''
+        if not isinstance(text, str):
+            raise ValueError('field {!r} is {}, not a string'.format(field, type(text).__name__))
+    else:
+        record = {'text': line}
+        text = line
+
+    tokens = text.split()
+    lemmas = [lemmatize(token) for token in tokens]
+    record['lemmatized_text'] = ' '.join(lemmas)
+    record['lemmas'] = lemmas
+    return record, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lemmatize a text or JSONL corpus line by line.')
+    parser.add_argument('input', help='input file, text or JSONL')
+    parser.add_argument('-o', '--output', default='-', help='output JSONL file (default: stdout)')
+    parser.add_argument('--format', choices=('text', 'jsonl'), help='input format (default: from the extension)')
+    parser.add_argument('--field', default='text', help='JSONL field holding the text (default: text)')
+    parser.add_argument('--start-offset', type=int, default=0, help='byte offset of the input line to start at')
+    parser.add_argument('--resume', action='store_true', help='append to the output, continuing after its last line')
+    parser.add_argument('--cache-size', type=int, default=100000, help='distinct words kept in the lemma cache')
+    parser.add_argument('--progress-interval', type=float, default=5.0, help='seconds between progress reports')
+    args = parser.parse_args()
+
+    input_format = args.format or ('jsonl' if args.input.endswith(('.jsonl', '.ndjson')) else 'text')
+    offset = args.start_offset
+    if args.resume:
+        if args.output == '-':
+            parser.error('--resume needs an output file')
+        offset = max(offset, find_resume_offset(args.output))
+
+    lemmatize = lru_cache(maxsize=args.cache_size)(lemmatizer.lemmatize)
+    lemmatizer.load()
+
+    total_bytes = os.path.getsize(args.input)
+    if args.output == '-':
+        output = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='\n')
+    else:
+        output = open(args.output, 'a' if args.resume else 'w', encoding='utf-8', newline='\n')
+
+    lines = words = errors = line_number = 0
+    start = last_report = time.perf_counter()
+    with open(args.input, 'rb') as source:
+        source.seek(offset)
+        if offset:
+            print('Starting at byte offset {:,}'.format(offset), file=sys.stderr)
+        for raw in source:
+            line_offset, offset = offset, offset + len(raw)
+            line_number += 1
+            line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+            if input_format == 'jsonl' and not line.strip():
+                continue
+            try:
+                record, tokens = lemmatize_line(line, input_format, args.field, lemmatize)
+            except Exception as e:
+                # One bad line must not end a multi-GB run; record it and keep the offsets going
+                print('Skipping line {:,} (byte offset {:,}): {}'.format(line_number, line_offset, e), file=sys.stderr)
+                record, tokens = {'error': str(e)}, []
+                errors += 1
+            record['offset'] = line_offset
+            record['next_offset'] = offset
+            output.write(json.dumps(record, ensure_ascii=False))
+            output.write('\n')
+
+            lines += 1
+            words += len(tokens)
+            now = time.perf_counter()
+            if now - last_report >= args.progress_interval:
+                output.flush()
+                print(format_progress(offset, total_bytes, lines, words, now - start), file=sys.stderr)
+                last_report = now
+
+    output.flush()
+    if args.output != '-':
+        output.close()
+    elapsed = time.perf_counter() - start
+    cache = lemmatize.cache_info()
+    print('Done: ' + format_progress(offset, total_bytes, lines, words, elapsed), file=sys.stderr)
+    print('Lemma cache: {:,} hits, {:,} misses'.format(cache.hits, cache.misses), file=sys.stderr)
+    if errors:
+        print('{:,} lines could not be lemmatized; see the "error" records'.format(errors), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,27 @@
 # encoding: utf8
 
-from typing import Tuple, List, Set
-
-from Lemmatization.lib.trie_v1 import TrieNode, add
+import logging
+import threading
+import time
+from typing import Dict, Tuple, List, Set, Iterable
+
+from Lemmatization.lib.affix_rules import AffixRule, AffixRuleTable
+from Lemmatization.lib.prefix_index import PrefixIndex
+from Lemmatization.lib.snapshot import open_snapshot, write_snapshot
+from Lemmatization.lib.trie_v2 import Trie
 from Lemmatization.utility import helper
 from Lemmatization.utility.reader import read_csv
 from Lemmatization.utility.reader import read_file
 
+logger = logging.getLogger(__name__)
+
+# status codes returned by find_lemma, alongside the word and its lemma
+IN_LEXICON = 0
+NOT_FOUND = 1
+PREFIX_RULE = 2
+SUFFIX_RULE = 3
+BUDGET_EXHAUSTED = 4
+
 
 def get_suffix_rules(lines: List[str]) -> List[Tuple[str, ...]]:
     """
@@ -17,221 +32,306 @@ def get_suffix_rules(lines: List[str]) -> List[Tuple[str, ...]]:
     return [tuple(line.strip().split(' ')) for line in lines if line.startswith('SFX')]
 
 
-def get_suffix_rules_based_on_number(rule_number: List[str], rules: List[Tuple[str, ...]]) -> List[Tuple[str, ...]]:
-    """
-    filters the sorted rules based on rule number given
-    :param rule_number: list: ['15', '22', '8', '43']
-    :param rules: list of tuples of rules
-    :return: list of tuples of filtered rules
-    """
-    return [rule for rule in rules if rule[1] in rule_number and rule[2] != "Y"]
-
-
-def get_sorted_rules() -> List[Tuple]:
-    """
-    :return: list of sorted rules based on the length suffix or affix in descending order
-    """
-    lines = get_suffix_rules(read_file(helper.get_nepali_rules_path()))
-    return sorted(lines, key=lambda tup: len(tup[3].split('/')[0]), reverse=True)
-
-
-def make_dict_trie() -> TrieNode:
-    root = TrieNode('*')
-    csv_path = helper.get_root_pos_rule_csv_path()
-    root_data = read_csv(csv_path)
-    for d in root_data:
-        word = d.get('word').strip()
-        pos = d.get('pos').strip() or None
-        rules = list(filter(None, d.get('rules').strip().split(',')))
-        add(root, word, rules, pos)
-    return root
-
-
-def find_prefix(root, prefix: str) -> Tuple[bool, int, tuple, list]:
-    """
-    Check and return
-      1. If the prefix exists in any of the words we added so far
-      2. If yes then how may words actually have the prefix
-    """
-    # TODO check find prefix method / refactor
-    node = root
-    possibilities = []
-    matched = ''
-    # If the root node has no children, then return False.
-    # Because it means we are trying to search in an empty trie
-    if not root.children:
-        return False, 1, tuple(), []
-    for idx, char in enumerate(prefix):
-        char_not_found = True
-        # Search through all the children of the present `node`
-        for child in node.children:
-            if child.char == char:
-                # We found the char existing in the child.
-                char_not_found = False
-                # Assign node as the child containing the char and break
-                node = child
-                matched += char
-                if node.word_finished:
-                    possibilities.append((matched, node.rules))
-                break
-        # Have we reached end of a word while our prefix string is not exhausted?
-        # Meaning, let's say, we have 'hammer' as a word in trie and the prefix
-        # we are searching for is 'hammeres'.
-        if node.word_finished and idx < (len(prefix) - 1) and not node.children:
-            # If so, return false. We are trying to search for a prefix longer than
-            # the actual closest match.
-            if possibilities:
-                possibilities = possibilities[-1]
-            return False, 2, possibilities, []
-        # Return False anyway when we did not find a word.
-        if char_not_found:
-            if possibilities:
-                possibilities = possibilities[-1]
-            return False, 3, possibilities, []
-        if idx == len(prefix) - 1 and not node.word_finished:
-            if possibilities:
-                possibilities = possibilities[-1]
-            return False, 4, possibilities, []
-    # Well, we are here means we have found the prefix. Return true to indicate that
-    # And also the counter of the last node. This indicates how many words have this
-    # prefix
-    # print(possibilities)
-    if possibilities:
-        possibilities = possibilities[-1]
-    return True, 5 + node.counter, possibilities, []
-
-
-def get_rules_for_words_starting_with(starting: str, full_word: str) -> Tuple[Set, List[Tuple[str, List]]]:
+def get_affix_rule_table(rules: List[Tuple[str, ...]] = None) -> AffixRuleTable:
     """
-    get all words starting with a letter along with their rules for word formation
-    :param starting: staring letter of word to be lemmatized, स
-    :param full_word: word to be lemmatized; सम्बन्धमा
-    :return: set of rules for all words founds, list of (word, rules)
+    :param rules: SFX lines split to tuples, read from the affix file when not given
+    :return: rules of the affix file compiled into lookup tables
     """
-    rules_only = set()
-    words = list()
-    csv_path = helper.get_root_pos_rule_csv_path()
-    root_data = read_csv(csv_path)
-    for d in root_data:
-        word = d.get('word').strip()
-        rules = list(filter(None, d.get('rules').strip().split(',')))
-        if rules and word.startswith(starting) and len(word) <= len(full_word):
-            rules_only = rules_only.union(set(rules))
-            words.append((word, rules))
-    return rules_only, words
+    if rules is None:
+        rules = get_suffix_rules(read_file(helper.get_nepali_rules_path()))
+    return AffixRuleTable(rules)
 
 
-def get_matching_rules(rules: List[Tuple[str, ...]], word_to_lemmatize: str) -> List[Tuple[str, ...]]:
+def load_root_table() -> List[Tuple[str, str, List[str]]]:
     """
-    filter rules that do not have affix ending in given word to lemmatize
-    :param rules: list of rules
-    :param word_to_lemmatize: str
-    :return: list of filtered rules
+    reads the root csv once and parses each row
+    :return: list of (word, pos, rules) in csv order
     """
-    chopping_rules = list()
-    for rule in rules:
-        if word_to_lemmatize.endswith(rule[3].split('/')[0]):
-            chopping_rules.append(rule)
-    return chopping_rules
+    root_data = read_csv(helper.get_root_pos_rule_csv_path())
+    return [
+        (d.get('word').strip(), d.get('pos').strip() or None, list(filter(None, d.get('rules').strip().split(','))))
+        for d in root_data
+    ]
+
+
+def make_dict_trie(root_table: List[Tuple[str, str, List[str]]] = None) -> Trie:
+    trie = Trie()
+    if root_table is None:
+        root_table = load_root_table()
+    for word, pos, rules in root_table:
+        trie.add(word, rules, pos)
+    return trie
 
 
-def filter_words(words: List[Tuple], rules: List[Tuple[str, ...]], full_word: str) -> Set[Tuple[str, Tuple[str, ...]]]:
+def get_lexicon_sources() -> List[str]:
     """
-    filters word whose rule matches with rules given
+    :return: paths of the files the lexicon is built from
     """
-    return {(word, r) for word, rule in words for r in rules if len(full_word) >= len(word) and r[1] in rule}
+    return [helper.get_root_pos_rule_csv_path(), helper.get_nepali_rules_path()]
 
 
-def make_words(prefix_matched: str, rule: Tuple[str, ...]):
+def build_lexicon_snapshot(sources: Dict[str, str], path: str = None) -> int:
     """
-    make word from prefix matched and rules
-    :param prefix_matched: prefix matched
-    :param rule: rule
-    :return: word made using prefix and rules
+    build the trie, the prefix index and the affix rules from the source files and write them as a snapshot
+    :param sources: checksums of get_lexicon_sources(), see data_checksums.source_checksums
+    :param path: snapshot file, next to the data files by default
+    :return: size of the snapshot in bytes
     """
-    if len(rule) == 5:
-        _, rule_number, to_replace, replace_by, ending = rule
-    else:
-        _, rule_number, to_replace, replace_by, ending, _ = rule
-    replace = replace_by.strip().split('/')
-    replace_by = replace[0]
+    root_table = load_root_table()
+    return write_snapshot(path or helper.get_lexicon_snapshot_path(), sources,
+                          make_dict_trie(root_table), PrefixIndex(root_table),
+                          get_suffix_rules(read_file(helper.get_nepali_rules_path())))
 
-    def check_ending(token, end):
-        if "." == end:
-            return True
-        end = end.replace('[', '')
-        end = end.replace(']', '')
-        end = list(end)
-        if end[0] == '^':
-            return all(not token.endswith(end) for end in end)
-        return any(token.endswith(end) for end in end)
 
-    def replace(token, to_replace, replace_by):
-        if to_replace.isdigit() and int(to_replace) == 0:
-            return token + replace_by
-        return token[:-len(to_replace)] + replace_by
+def get_rules_for_words_starting_with(starting: str, full_word: str,
+                                      prefix_index: PrefixIndex = None) -> Tuple[Set, List[Tuple[str, List]]]:
+    """
+    get all words starting with a letter along with their rules for word formation
+    :param starting: staring letter of word to be lemmatized, स
+    :param full_word: word to be lemmatized; सम्बन्धमा
+    :param prefix_index: index over the root table, built from the csv when not given
+    :return: set of rules for all words founds, list of (word, rules)
+    """
+    if prefix_index is None:
+        prefix_index = PrefixIndex(load_root_table())
+    return prefix_index.words_starting_with(starting, len(full_word))
 
-    if check_ending(prefix_matched, ending):
-        return replace(prefix_matched, to_replace, replace_by)
 
+def filter_words(words: List[Tuple], rules: List[AffixRule], full_word: str) -> Set[Tuple[str, AffixRule]]:
+    """
+    filters word whose rule matches with rules given
+    """
+    return {(word, r) for word, rule in words for r in rules if len(full_word) >= len(word) and r.number in rule}
 
-def chop_words(full_word: str) -> str:
+
+def chop_words(full_word: str, prefix_index: PrefixIndex = None,
+               rule_table: AffixRuleTable = None) -> str:
     """
     check all roots starting with characters less than the full word and make word using rules to find the correct root
     :param full_word: word to lemmatize
+    :param prefix_index: index over the root table, built from the csv when not given
+    :param rule_table: compiled affix rules, read from disk when not given
     :return: root or full word
     """
+    if prefix_index is None:
+        prefix_index = PrefixIndex(load_root_table())
     for i in range(len(full_word) - 1, 0, -1):
-        rules, words = get_rules_for_words_starting_with(full_word[:i], full_word)
-        status, word = check_for_prefix_chop(full_word, words, rules)
+        rules, words = get_rules_for_words_starting_with(full_word[:i], full_word, prefix_index)
+        status, word = check_for_prefix_chop(full_word, words, rules, rule_table)
         if status:
             return word
 
     return full_word
 
 
-def check_for_prefix_chop(full_word: str, words: List[Tuple[str, List[str]]], rules: Set[str]) -> Tuple[bool, str]:
+def check_for_prefix_chop(full_word: str, words: List[Tuple[str, List[str]]], rules: Set[str],
+                          rule_table: AffixRuleTable = None) -> Tuple[bool, str]:
     """
     check if the rules of matched prefix forms the given word for lemmatization
     :param full_word: word to be lemmatized: हेराइदिँदा
     :param words: list of most matched prefix with the rules: [('हेराइ', ['15', '22', '8', '43'])]
     :param rules: list of rules of most matched prefix: ['15', '22', '8', '43']
+    :param rule_table: compiled affix rules, read from disk when not given
     :return: either word or prefix
     """
-    rules = get_suffix_rules_based_on_number(list(rules), get_sorted_rules())
-    chopping_rules = get_matching_rules(rules, full_word)
+    if rule_table is None:
+        rule_table = get_affix_rule_table()
+    chopping_rules = rule_table.matching_rules(full_word, rules)
     if not chopping_rules:
         return False, full_word
     words = filter_words(words, chopping_rules, full_word)
     for word, rule in words:
-        built_word = make_words(word, rule)
+        built_word = rule.apply(word)
         if full_word == built_word:
             return True, word
     return False, full_word
 
 
-def get_lemma(trie, word: str, chopped: str = None) -> Tuple[int, str, str]:
-    # TODO refactor/rethink of this algorithm
+def get_lemma(trie: Trie, word: str, chopped: str = None, prefix_index: PrefixIndex = None,
+              rule_table: AffixRuleTable = None) -> Tuple[int, str, str]:
+    """
+    recursive lemmatization, kept as the reference for find_lemma which the Lemmatizer uses
+    """
     if word == chopped:
         return 1, word, word
     word = chopped if chopped else word
-    matched, num, prefix, _ = find_prefix(trie, word)
+    matched, num, prefix, _ = trie.find_prefix(word)
     if matched:
         return 0, word, word
     elif prefix:
-        status, new_word = check_for_prefix_chop(word, [prefix], set(prefix[1]))
+        status, new_word = check_for_prefix_chop(word, [prefix], set(prefix[1]), rule_table)
         if status:
             return 2, word, new_word
-    return get_lemma(trie, word, chop_words(word))
+    return get_lemma(trie, word, chop_words(word, prefix_index, rule_table), prefix_index, rule_table)
+
+
+def _shared_prefix_length(first: str, second: str) -> int:
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return length
+
+
+def find_lemma(trie: Trie, word: str, prefix_index: PrefixIndex, rule_table: AffixRuleTable,
+               max_work: int = None, time_budget: float = None) -> Tuple[int, str, str]:
+    """
+    iterative replacement of get_lemma. Instead of trying every prefix of the word against every root,
+    undo each suffix rule whose affix ends the word and look the resulting stems up in the prefix index.
+    :param trie: trie of the root words
+    :param word: word to lemmatize: हेराइदिँदा
+    :param prefix_index: index over the root words with rules
+    :param rule_table: compiled affix rules
+    :param max_work: number of root candidates to examine before giving up, no limit when None
+    :param time_budget: seconds to spend on the word before giving up, no limit when None
+    :return: (status, word, lemma); the lemma is the word itself when nothing is found or the budget runs out
+    """
+    matched, _, prefix, _ = trie.find_prefix(word)
+    if matched:
+        return IN_LEXICON, word, word
+    # the longest root the word starts with wins when one of its own rules builds the word
+    if prefix:
+        root, rules = prefix
+        for rule in rule_table.matching_rules(word, rules):
+            if rule.apply(root) == word:
+                return PREFIX_RULE, word, root
+
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    work = 0
+    lemma, lemma_shared = None, 0
+    # a rule applied to a root keeps all but its last len(strip) characters and appends the affix,
+    # so the roots that can build the word are the ones starting with the word minus the affix
+    for rule in rule_table.matching_rules(word):
+        stem = word[:len(word) - len(rule.affix)]
+        length = len(stem) + len(rule.strip)
+        # with an empty stem any root not longer than the strip qualifies, if it shares the first character
+        start, end = prefix_index.prefix_range(stem or word[:1])
+        for i in range(start, end):
+            work += 1
+            if max_work is not None and work > max_work:
+                return BUDGET_EXHAUSTED, word, word
+            root = prefix_index.words[i]
+            if (len(root) == length if stem else len(root) <= length) and len(root) <= len(word) \
+                    and rule.number in prefix_index.rules[i] and rule.apply(root) == word:
+                # prefer the root sharing the longest beginning with the word, as chop_words does
+                shared = min(_shared_prefix_length(root, word), len(word) - 1)
+                if shared > lemma_shared:
+                    lemma, lemma_shared = root, shared
+        if deadline is not None and time.perf_counter() > deadline:
+            return BUDGET_EXHAUSTED, word, word
+    if lemma is not None:
+        return SUFFIX_RULE, word, lemma
+    return NOT_FOUND, word, word
+
+
+class Lemmatizer(object):
+    """
+    Lemmatizer engine. The trie, the root table and the affix rules are loaded
+    once, on first use, and shared read-only by every thread afterwards.
+    Given the checksums of the source files, they are memory mapped from the
+    lexicon snapshot, which is rebuilt when the checksum of the root csv or the
+    affix file changes; without them they are built from the files.
+    max_work and time_budget bound the effort spent on a single word (see find_lemma).
+    """
+
+    def __init__(self, snapshot_path: str = None, use_snapshot: bool = True,
+                 max_work: int = 10000, time_budget: float = None):
+        self.snapshot_path = snapshot_path or helper.get_lexicon_snapshot_path()
+        self.use_snapshot = use_snapshot
+        self.max_work = max_work
+        self.time_budget = time_budget
+        self.snapshot = None
+        self.trie = None
+        self.prefix_index = None
+        self.rule_table = None
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def load(self, sources: Dict[str, str] = None) -> 'Lemmatizer':
+        """
+        Load the lexicon and rules only once per instance.
+        :param sources: checksums of get_lexicon_sources() (see data_checksums.source_checksums),
+                        which the snapshot is checked against; the snapshot is only used with them
+        """
+        if self._loaded:
+            return self
+        with self._load_lock:
+            if not self._loaded:
+                if not (self.use_snapshot and sources is not None and self._load_snapshot(sources)):
+                    root_table = load_root_table()
+                    self.trie = make_dict_trie(root_table)
+                    self.prefix_index = PrefixIndex(root_table)
+                    self.rule_table = get_affix_rule_table()
+                self._loaded = True
+        return self
+
+    def _load_snapshot(self, sources: Dict[str, str]) -> bool:
+        snapshot = open_snapshot(self.snapshot_path, sources)
+        if snapshot is None:
+            logger.info("Building lexicon snapshot %s", self.snapshot_path)
+            try:
+                build_lexicon_snapshot(sources, self.snapshot_path)
+            except OSError as e:
+                logger.warning("Could not write lexicon snapshot: %s", e)
+                return False
+            snapshot = open_snapshot(self.snapshot_path, sources)
+            if snapshot is None:
+                return False
+        self.snapshot = snapshot
+        self.trie = snapshot.trie()
+        self.prefix_index = snapshot.prefix_index()
+        self.rule_table = get_affix_rule_table(snapshot.affix_rules())
+        return True
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get_lemma(self, word: str) -> Tuple[int, str, str]:
+        self.load()
+        return find_lemma(self.trie, word, self.prefix_index, self.rule_table, self.max_work, self.time_budget)
+
+    def lemmatize(self, word: str) -> str:
+        status, original_word, lemma = self.get_lemma(word)
+        return lemma
+
+    def lemmatize_many(self, words: Iterable[str]) -> List[str]:
+        """
+        lemmatize every distinct word once
+        :param words: words to lemmatize, repetitions allowed
+        :return: lemmas in the order of the given words
+        """
+        words = list(words)
+        lemmas = {word: self.lemmatize(word) for word in dict.fromkeys(words)}
+        return [lemmas[word] for word in words]
+
+
+lemmatizer = Lemmatizer()
+
 
 def lemmatize_word(word: str) -> str:
     """
     Entry point to lemmatize a word from external modules.
-    It builds trie only once and lemmatizes the word.
+    Uses the shared module level engine, so the trie is built only once per process.
+    """
+    return lemmatizer.lemmatize(word)
+
+
+def lemmatize_words(words: Iterable[str]) -> List[str]:
+    """
+    Entry point to lemmatize many words at once; repeated words are lemmatized only once.
+    """
+    return lemmatizer.lemmatize_many(words)
+
+
+def init_worker(sources: Dict[str, str] = None) -> None:
+    """
+    process pool initializer: load the shared engine once per worker process,
+    lemmatize_words is then the task run on each chunk of words
+    :param sources: checksums of the lexicon source files, see Lemmatizer.load
     """
-    trie_node = make_dict_trie()
-    status, original_word, lemma = get_lemma(trie_node, word)
-    return lemma
+    lemmatizer.load(sources)
 
 # if __name__ == '__main__':
 #     trie_node = make_dict_trie()
@@ -0,0 +1,29 @@
+"""
+Checksums of the data files the lemmatizer and stemmer caches are built from.
+
+The lexicon snapshot, the stemmer's full-form index and its parsed-table cache
+all record the checksums of their source files and are rebuilt when they change.
+"""
+
+import hashlib
+import os
+
+
+def file_checksum(path):
+    """
+    :param path: file to hash
+    :return: sha256 hex digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_checksums(paths):
+    """
+    :param paths: data files a cache is built from
+    :return: file name -> checksum, the key the cache is valid for
+    """
+    return {os.path.basename(path): file_checksum(path) for path in paths}
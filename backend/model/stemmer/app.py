@@ -2,7 +2,13 @@
 import streamlit as st
 import os
 import re
+import sys
 import pandas as pd
+
+# The data file checksums are shared with the lemmatizer, one directory up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_checksums import source_checksums
 from morph import Morph
 
 # Set page config
@@ -26,52 +32,23 @@ def load_morph_analyzer():
             st.error("Required data files not found. Please ensure all files are in the 'files' directory.")
             return None
             
-        morph = Morph(root_file, suffix_file, suffix_rule_file)
+        morph = Morph(root_file, suffix_file, suffix_rule_file, cache_dir=".cache",
+                      sources=source_checksums([root_file, suffix_file, suffix_rule_file]))
         return morph
     except Exception as e:
         st.error(f"Error loading morphological analyzer: {str(e)}")
         return None
 
-def analyze_word(morph, word):
-    """Analyze a single Nepali word."""
-    if not morph or not word.strip():
-        return None
-    
-    word = word.strip()
-    results = {
-        'word': word,
-        'is_root': False,
-        'analyses': []
-    }
-    
-    # Check if the word is directly in the root list
-    if word in morph.roots:
-        results['is_root'] = True
-        pos = morph.pos.get(word, "Unknown")
-        results['analyses'].append({
-            'type': 'Root Word',
-            'root': word,
-            'suffix': '',
-            'pos': pos,
-            'rule': ''
-        })
-    
-    # Try to find possible roots by removing suffixes
-    for suffix in morph.suffixes:
-        if word.endswith(suffix) and len(word) > len(suffix):
-            potential_root = word[:-len(suffix)]
-            if potential_root in morph.roots:
-                pos = morph.pos.get(potential_root, "Unknown")
-                rule = morph.suffix_rules.get(suffix, "Unknown")
-                results['analyses'].append({
-                    'type': 'Root + Suffix',
-                    'root': potential_root,
-                    'suffix': suffix,
-                    'pos': pos,
-                    'rule': rule
-                })
+def analyze_words(morph, words):
+    """Analyze Nepali words, each distinct word only once."""
+    if not morph:
+        return []
     
-    return results
+    words = [word.strip() for word in words if word.strip()]
+    return [
+        {'word': word, 'is_root': is_root, 'analyses': analyses}
+        for word, (is_root, analyses) in zip(words, morph.analyze_many(words))
+    ]
 
 def main():
     st.title("🇳🇵 Nepali Morphological Analyzer")
@@ -113,14 +90,12 @@ def main():
         root_count = 0
         analyzed_count = 0
         
-        for word in words:
-            result = analyze_word(morph, word)
-            if result:
-                analyzed_words.append(result)
-                if result['is_root']:
-                    root_count += 1
-                if result['analyses']:
-                    analyzed_count += 1
+        for result in analyze_words(morph, words):
+            analyzed_words.append(result)
+            if result['is_root']:
+                root_count += 1
+            if result['analyses']:
+                analyzed_count += 1
         
         with col2:
             st.metric("Root Words", root_count)
@@ -149,11 +124,11 @@ def main():
                 for analysis in result['analyses']:
                     table_data.append({
                         'Word': word,
-                        'Analysis Type': analysis['type'],
-                        'Root': analysis['root'],
-                        'Suffix': analysis['suffix'] if analysis['suffix'] else '-',
-                        'Part of Speech': analysis['pos'],
-                        'Rule': analysis['rule'] if analysis['rule'] else '-'
+                        'Analysis Type': analysis.type,
+                        'Root': analysis.root,
+                        'Suffix': analysis.suffix if analysis.suffix else '-',
+                        'Part of Speech': analysis.pos,
+                        'Rule': analysis.rule if analysis.rule else '-'
                     })
         
         # Create and display the DataFrame
@@ -0,0 +1,70 @@
+# coding=utf-8
+"""
+Build the full-form index Morph looks words up in before running the rules.
+
+Every root, root + suffix and single strip rule form is analyzed once and
+stored; prints the index size and how much of the root list it covers.
+With --words, also reports the share of the tokens of a text file that the
+index answers without the rule based fallback.
+
+Usage: python build_fullform_index.py [--output files/fullform.index] [--words corpus.txt]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+# The data file checksums are shared with the lemmatizer, one directory up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_checksums import source_checksums  # noqa: E402
+from fullform_index import FullFormIndex, build_index  # noqa: E402
+from morph import Morph  # noqa: E402
+
+FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'files')
+DATA_FILES = (
+    os.path.join(FILES_DIR, 'root'),
+    os.path.join(FILES_DIR, 'suffix.txt'),
+    os.path.join(FILES_DIR, 'suffix_rule.txt'),
+)
+DEFAULT_INDEX = os.path.join(FILES_DIR, 'fullform.index')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--output', default=DEFAULT_INDEX, help='index file to write')
+    parser.add_argument('--max-depth', type=int, default=3,
+                        help='max_depth the forms are analyzed with, must match the runtime Morph')
+    parser.add_argument('--words', help='text file to measure token coverage on')
+    args = parser.parse_args()
+
+    morph = Morph(*DATA_FILES, max_depth=args.max_depth)
+    sources = source_checksums(DATA_FILES)
+    start = time.perf_counter()
+    stats = build_index(morph, args.output, sources)
+    print("Wrote full-form index {} in {:.1f}s".format(args.output, time.perf_counter() - start))
+    print("  forms:    {:,} ({:,} generated, the rest had no analysis)".format(stats['forms'], stats['generated']))
+    print("  analyses: {:,} ({:.2f} per form)".format(stats['analyses'], stats['analyses'] / max(stats['forms'], 1)))
+    print("  size:     {:.1f} MB ({:.1f} bytes per form)".format(
+        stats['bytes'] / 1e6, stats['bytes'] / max(stats['forms'], 1)))
+
+    index = FullFormIndex.open(args.output, sources)
+    covered = sum(1 for root in morph.root_set if index.lookup(root) is not None)
+    print("  roots:    {:,} of {:,} in files/root indexed ({:.1%}), {:,} roots reachable".format(
+        covered, len(morph.root_set), covered / max(len(morph.root_set), 1), stats['roots']))
+
+    if args.words:
+        with open(args.words, 'r', encoding='utf-8') as f:
+            tokens = re.findall(r'[ऀ-ॿ]+', f.read())
+        hits = sum(1 for token in tokens if index.lookup(token) is not None)
+        distinct = set(tokens)
+        distinct_hits = sum(1 for token in distinct if index.lookup(token) is not None)
+        print("  {}: {:,} of {:,} tokens ({:.1%}), {:,} of {:,} distinct words ({:.1%}) indexed".format(
+            args.words, hits, len(tokens), hits / max(len(tokens), 1),
+            distinct_hits, len(distinct), distinct_hits / max(len(distinct), 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+# coding=utf-8
+"""
+Precomputed full-form index for the morphological analyzer.
+
+Every surface form reachable from a root with one suffix (a literal suffix
+from suffix.txt or one strip rule from suffix_rule.txt, applied in reverse) is
+analyzed once, offline, and stored with its analyses. At runtime Morph looks a
+word up here first and only runs the rule based analysis for unseen forms.
+
+The file is read through a read only memory map, so worker processes share
+its pages instead of each holding a copy of the table.
+
+Layout:
+  magic (8 bytes) | header length (uint32, little endian) | JSON header | arrays
+The JSON header holds the format version, the checksums of the source files,
+the max_depth the forms were analyzed with, the root and (type, suffix, rule)
+tables, and the (offset, length) of each array. Arrays are little endian
+uint32, 4 byte aligned, with offsets counted from the end of the header:
+  form_offsets   n + 1 offsets into form_bytes
+  form_bytes     utf-8 forms, sorted (utf-8 keeps code point order)
+  analysis_start n + 1 offsets into analyses
+  analyses       (root id, entry id) pairs
+  slots          open addressing hash table over the forms: form id + 1 at
+                 crc32(form) modulo its power of two size, linear probing, 0 is empty
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+MAGIC = b'NPFFIDX\x00'
+VERSION = 2
+_HEADER_LENGTH = struct.Struct('<I')
+_ARRAYS = ('form_offsets', 'form_bytes', 'analysis_start', 'analyses', 'slots')
+
+
+def _uint32_array(values):
+    data = array('I', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+
+def generate_forms(morph):
+    """
+    Enumerate the surface forms one suffix away from a root.
+
+    Covers the roots themselves, root + every literal suffix, and every strip
+    rule applied in reverse (drop what the rule inserts, append what it deletes).
+
+    :param morph: loaded Morph
+    :return: set of surface forms
+    """
+    rules = []
+    stack = [morph.rule_automaton]
+    while stack:
+        node = stack.pop()
+        rules.extend((delete, insert) for delete, insert, _, _ in node[1])
+        stack.extend(node[0].values())
+
+    forms = set(morph.root_set)
+    for root in morph.root_set:
+        forms.update(root + suffix for suffix in morph.suffixes)
+        for delete, insert in rules:
+            if root.endswith(insert):
+                forms.add(root[:len(root) - len(insert)] + delete)
+    return forms
+
+
+def build_index(morph, path, sources):
+    """
+    Analyze every generated form with morph and write the index atomically.
+
+    :param morph: loaded Morph, its max_depth is recorded in the index
+    :param path: where to write the index
+    :param sources: source file checksums, see data_checksums.source_checksums
+    :return: dict of statistics about the index
+    """
+    forms = sorted((form.encode('utf-8') for form in generate_forms(morph)))
+    roots, root_ids = [], {}
+    entries, entry_ids = [], {}
+    form_offsets, form_bytes = [0], bytearray()
+    analysis_start, analyses = [0], []
+    generated = len(forms)
+    for encoded in forms:
+        form = encoded.decode('utf-8')
+        _, found = morph.analyze(form)
+        if not found:
+            continue
+        for analysis in found:
+            if analysis.root not in root_ids:
+                root_ids[analysis.root] = len(roots)
+                roots.append(analysis.root)
+            entry = (analysis.type, analysis.suffix, analysis.rule)
+            if entry not in entry_ids:
+                entry_ids[entry] = len(entries)
+                entries.append(entry)
+            analyses.extend((root_ids[analysis.root], entry_ids[entry]))
+        form_bytes += encoded
+        form_offsets.append(len(form_bytes))
+        analysis_start.append(len(analyses) // 2)
+    del forms
+
+    # keep the hash table at most half full so probe sequences, misses included, stay short
+    count = len(form_offsets) - 1
+    size = 1
+    while size < count * 2:
+        size *= 2
+    slots = array('I', bytes(4 * size))
+    for i in range(count):
+        slot = zlib.crc32(form_bytes[form_offsets[i]:form_offsets[i + 1]]) & (size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = i + 1
+
+    # pad the blob so every array stays 4 byte aligned
+    form_bytes += b'\x00' * (-len(form_bytes) % 4)
+    data = [_uint32_array(form_offsets).tobytes(), bytes(form_bytes),
+            _uint32_array(analysis_start).tobytes(), _uint32_array(analyses).tobytes(),
+            _uint32_array(slots).tobytes()]
+    sections, offset = {}, 0
+    for name, blob in zip(_ARRAYS, data):
+        sections[name] = [offset, len(blob)]
+        offset += len(blob)
+    header = json.dumps({
+        'version': VERSION,
+        'sources': sources,
+        'max_depth': morph.max_depth,
+        'count': count,
+        'roots': roots,
+        'entries': entries,
+        'sections': sections,
+    }, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + _HEADER_LENGTH.size + len(header)) % 4)
+
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for blob in data:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+    return {
+        'forms': count,
+        'generated': generated,
+        'analyses': len(analyses) // 2,
+        'roots': len(roots),
+        'entries': len(entries),
+        'bytes': os.path.getsize(path),
+    }
+
+
+class FullFormIndex:
+    """
+    Read only view of an index file, see the module docstring for the layout.
+    """
+
+    def __init__(self, f, mapped, header, data_start):
+        self._file = f
+        self._map = mapped
+        self.max_depth = header['max_depth']
+        self.roots = header['roots']
+        self.entries = [tuple(entry) for entry in header['entries']]
+        arrays = {}
+        for name, (offset, length) in header['sections'].items():
+            arrays[name] = memoryview(mapped)[data_start + offset:data_start + offset + length]
+        self._form_offsets = self._uint32_view(arrays['form_offsets'])
+        self._form_bytes = arrays['form_bytes']
+        self._analysis_start = self._uint32_view(arrays['analysis_start'])
+        self._analyses = self._uint32_view(arrays['analyses'])
+        self._slots = self._uint32_view(arrays['slots'])
+        self._mask = len(self._slots) - 1
+        self._count = header['count']
+
+    @staticmethod
+    def _uint32_view(view):
+        if sys.byteorder == 'little':
+            return view.cast('I')
+        data = array('I', bytes(view))
+        data.byteswap()
+        return data
+
+    @staticmethod
+    def _check_sections(header, data_length):
+        """
+        Raise ValueError unless every array lies inside the data, is 4 byte
+        aligned and has the size the header implies, as a truncated or partly
+        written file would not.
+        """
+        sections = header.get('sections')
+        count = header.get('count')
+        if not isinstance(sections, dict) or not isinstance(count, int) or count < 0:
+            raise ValueError('index header is malformed')
+        lengths = {}
+        for name in _ARRAYS:
+            section = sections.get(name)
+            if (not isinstance(section, list) or len(section) != 2
+                    or not all(isinstance(value, int) and value >= 0 for value in section)):
+                raise ValueError('index section {} is malformed'.format(name))
+            offset, length = section
+            if offset % 4 or length % 4:
+                raise ValueError('index section {} is not 4 byte aligned'.format(name))
+            if offset + length > data_length:
+                raise ValueError('index section {} runs past the end of the file'.format(name))
+            lengths[name] = length
+        slots = lengths['slots'] // 4
+        if (lengths['form_offsets'] != 4 * (count + 1) or lengths['analysis_start'] != 4 * (count + 1)
+                or lengths['analyses'] % 8 or slots & (slots - 1) or slots < count):
+            raise ValueError('index sections do not match its {} forms'.format(count))
+
+    @classmethod
+    def open(cls, path, sources=None):
+        """
+        :param path: index file
+        :param sources: expected source checksums, None skips the check
+        :return: the index, or None when it is missing, unreadable or stale
+        """
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            prefix = len(MAGIC) + _HEADER_LENGTH.size
+            if mapped[:len(MAGIC)] != MAGIC:
+                raise ValueError('not a full-form index')
+            (header_length,) = _HEADER_LENGTH.unpack(mapped[len(MAGIC):prefix])
+            if prefix + header_length > len(mapped) or (prefix + header_length) % 4:
+                raise ValueError('index header runs past the end of the file')
+            header = json.loads(mapped[prefix:prefix + header_length].decode('utf-8'))
+            if not isinstance(header, dict):
+                raise ValueError('index header is malformed')
+            if header.get('version') != VERSION:
+                raise ValueError('index version {} is not {}'.format(header.get('version'), VERSION))
+            if sources is not None and header.get('sources') != sources:
+                raise ValueError('index was built from other data files')
+            cls._check_sections(header, len(mapped) - prefix - header_length)
+            return cls(f, mapped, header, prefix + header_length)
+        except (OSError, ValueError, KeyError, struct.error):
+            f.close()
+            return None
+
+    def __len__(self):
+        return self._count
+
+    def _form(self, i):
+        return bytes(self._form_bytes[self._form_offsets[i]:self._form_offsets[i + 1]])
+
+    def lookup(self, form):
+        """
+        :param form: surface form
+        :return: tuple of (type, root, suffix, rule), or None when the form is not indexed
+        """
+        key = form.encode('utf-8')
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            form_id = self._slots[slot]
+            if not form_id:
+                return None
+            form_id -= 1
+            if self._form(form_id) == key:
+                break
+            slot = (slot + 1) & self._mask
+        found = []
+        for i in range(self._analysis_start[form_id], self._analysis_start[form_id + 1]):
+            root_id, entry_id = self._analyses[2 * i], self._analyses[2 * i + 1]
+            analysis_type, suffix, rule = self.entries[entry_id]
+            found.append((analysis_type, self.roots[root_id], suffix, rule))
+        return tuple(found)
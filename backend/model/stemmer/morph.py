@@ -2,6 +2,26 @@
 from __future__ import unicode_literals
 __author__ = 'pravesh'
 
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from fullform_index import FullFormIndex
+
+# Bump when the parsed tables change so old loader caches are ignored.
+CACHE_VERSION = 3
+
+# One way of reading a word: type is 'Root Word', 'Root + Suffix' or, when
+# several suffixes were stripped, 'Root + Suffixes' with suffix and rule
+# joined by '+' from the root outwards.
+Analysis = namedtuple('Analysis', ['type', 'root', 'suffix', 'pos', 'rule'])
+
+# A rule from suffix_rule.txt; strip_rule is a tuple of StripRule, shortest delete first.
+Rule = namedtuple('Rule', ['type', 'subrule', 'morph', 'tag', 'ignore', 'strip_rule'])
+# Remove delete from the end of a word and append insert.
+StripRule = namedtuple('StripRule', ['delete', 'insert'])
+
 
 class Morph:
 
@@ -31,6 +51,7 @@ class Morph:
             else:
                 root, pos, suffix = tokens[0], tokens[1], tokens[2]
             self.roots.append(root)
+            self.root_set.add(root)
             self.pos[root] = pos or None  # Store POS tag for each root
             self.root_suffix[root] = suffix or None
 
@@ -55,7 +76,40 @@ class Morph:
                 continue
             suffix, rule = word.split("|")
             self.suffixes.append(suffix)
-            self.suffix_rules[suffix] = rule  # Map suffix to its rule number
+            self.suffix_rule_numbers[suffix] = rule  # Map suffix to its rule number
+
+    def build_suffix_trie(self):
+        """
+        Index the suffixes in a reverse trie: walking a word from its last
+        character visits exactly the suffixes it ends with.
+
+        Each node is [children, positions]; positions are indexes into
+        self.suffixes of the suffixes ending at that node, so a suffix listed
+        twice in suffix.txt is still reported twice.
+        """
+        self.suffix_trie = [{}, []]
+        for position, suffix in enumerate(self.suffixes):
+            node = self.suffix_trie
+            for char in reversed(suffix):
+                node = node[0].setdefault(char, [{}, []])
+            node[1].append(position)
+
+    def matching_suffixes(self, word):
+        """
+        Suffixes the word ends with, shorter than the word itself, in suffix.txt order.
+
+        One right-to-left walk over the word, so the cost depends on the word's
+        length and not on the number of suffixes.
+        """
+        positions = []
+        node = self.suffix_trie
+        # stop one character early: the suffix must leave a non-empty root
+        for char in reversed(word[1:]):
+            node = node[0].get(char)
+            if node is None:
+                break
+            positions.extend(node[1])
+        return [self.suffixes[position] for position in sorted(positions)]
 
     def read_suffix_rule(self):
         """
@@ -77,12 +131,9 @@ class Morph:
         """
         with open(self.suffix_rule_file_name, "r", encoding="utf-8") as f:
             content = f.read()
-        tokens = content.split("\n")
-        # Remove all empty lines.
-        tokens = [t for t in tokens if t.strip()]
-        tokens = list(tokens)  # Convert to list for popping
-        while tokens:
-            rule = tokens.pop(0)
+        # One pass over the non-empty lines; sub-rule lines are taken from the same iterator
+        tokens = iter([t for t in content.split("\n") if t.strip()])
+        for rule in tokens:
             parts = rule.split(" ")
             if len(parts) < 6:
                 continue  # Skip malformed lines
@@ -92,55 +143,337 @@ class Morph:
             except ValueError:
                 continue  # Skip lines with invalid numbers
             
-            # Store rule metadata and initialize strip_rule list
-            self.suffix_rules[num] = dict(type=type_rule, subrule=subrule, morph=morph, tag=tag, ignore=ignore,
-                                          strip_rule=[])
             strip_rule = []
             
             # Parse sub-rules that define character transformations
             for i in range(subrule):
-                if not tokens:
+                line = next(tokens, None)
+                if line is None:
                     break
-                line = tokens.pop(0)
                 # regular suffix transformations
                 if type_rule == "SFX":
                     parts = line.split(" ")
                     if len(parts) >= 2:
                         delete, insert = parts[0], parts[1]
                         # "." means add/remove nothing
-                        strip_rule.append(dict(insert=insert.replace(".", ""), delete=delete))
+                        strip_rule.append(StripRule(delete=delete, insert=insert.replace(".", "")))
                 # irregular suffix transformations (complex patterns)
                 elif type_rule == "SFXX":
                     # todo irregular suffix here
                     pass
 
-            # Sort transformations by length of what to delete (longest first)
-            if strip_rule and "delete" in strip_rule[0]:
-                strip_rule = sorted(strip_rule, key=lambda sub_rule: len(sub_rule["delete"]))
-            self.suffix_rules[num]['strip_rule'] = strip_rule
+            # Sort transformations by length of what to delete (shortest first)
+            strip_rule = sorted(strip_rule, key=lambda sub_rule: len(sub_rule.delete))
+            self.rules[num] = Rule(type=type_rule, subrule=subrule, morph=morph, tag=tag, ignore=ignore,
+                                   strip_rule=tuple(strip_rule))
+
+    def build_rule_automaton(self):
+        """
+        Compile the SFX strip rules into a reverse trie over the text each sub-rule deletes.
+
+        Walking a word from its last character visits every sub-rule that can
+        be applied to it. Each node is [children, entries] with entries
+        (delete, insert, rule number, final); final rules are the ones marked
+        to be ignored in the second parse, so their stem is not stripped again.
+        Sub-rules that delete nothing, such as the default rule 9998 that adds
+        the halant (गर -> गर्), sit on the root node and apply to every form.
+        """
+        self.rule_automaton = [{}, []]
+        for num, rule in self.rules.items():
+            if rule.type != "SFX":
+                continue
+            final = rule.ignore == "Y"
+            for delete, insert in rule.strip_rule:
+                # "." means delete nothing
+                if delete == ".":
+                    delete = ""
+                node = self.rule_automaton
+                for char in reversed(delete):
+                    node = node[0].setdefault(char, [{}, []])
+                node[1].append((delete, insert, str(num), final))
 
-    def __init__(self, root_file_name, suffix_file_name, suffix_rule_file_name):
+    def derivations(self, form, depth):
+        """
+        All ways of reaching a root from form by applying at most depth strip rules.
+
+        Sub-results are memoized per (form, depth), so stems shared by many
+        words (e.g. बच्चाहरू in बच्चाहरूको and बच्चाहरूलाई) are derived once.
+
+        :param form: word or intermediate stem
+        :param depth: maximum number of rules to apply
+        :return: tuple of (root, suffixes, rules), suffixes and rules ordered from the root outwards
+        """
+        key = (form, depth)
+        result = self._derivation_memo.get(key)
+        if result is not None:
+            return result
+
+        found = []
+        # Rules that delete nothing apply once to the form itself; they strip
+        # no suffix, so the derivation ends there
+        for delete, insert, rule, final in self.rule_automaton[1]:
+            if form + insert in self.root_set:
+                found.append((form + insert, (delete,), (rule,)))
+
+        node = self.rule_automaton
+        # stop one character early: a rule must leave a non-empty stem
+        for char in reversed(form[1:]):
+            node = node[0].get(char)
+            if node is None:
+                break
+            for delete, insert, rule, final in node[1]:
+                stem = form[:-len(delete)] + insert
+                if stem in self.root_set:
+                    found.append((stem, (delete,), (rule,)))
+                if not final and depth > 1:
+                    for root, suffixes, rules in self.derivations(stem, depth - 1):
+                        found.append((root, suffixes + (delete,), rules + (rule,)))
+
+        result = tuple(found)
+        if self.memo_size > 0:
+            if len(self._derivation_memo) >= self.memo_size:
+                self._derivation_memo.clear()
+            self._derivation_memo[key] = result
+        return result
+
+    def parse_files(self):
+        """
+        Parse the three data files, each in a single pass, and build the lookup tries.
+        """
+        self.read_root_list()             # Load root words and their POS tags
+        self.read_suffix_list()           # Load suffix -> rule mappings
+        self.build_suffix_trie()          # Reverse trie over the suffixes
+        self.read_suffix_rule()           # Load rule definitions and transformations
+        self.build_rule_automaton()       # Reverse trie over the strip rules
+
+    def _dump_tables(self, sources):
+        # Decoding 20k separate strings per table dominates the load time, so
+        # the root list and its POS and suffix columns go in as newline joined
+        # strings, one line per root. The tries are rebuilt on load.
+        return {
+            'version': CACHE_VERSION,
+            'sources': sources,
+            'roots': "\n".join(self.roots),
+            'pos': "\n".join(self.pos[root] or "" for root in self.roots),
+            'root_suffix': "\n".join(self.root_suffix[root] or "" for root in self.roots),
+            'suffixes': self.suffixes,
+            'suffix_rule_numbers': self.suffix_rule_numbers,
+            'rules': [[num, rule.type, rule.subrule, rule.morph, rule.tag, rule.ignore,
+                       [list(strip_rule) for strip_rule in rule.strip_rule]]
+                      for num, rule in self.rules.items()],
+        }
+
+    def _restore_tables(self, tables, sources):
+        if tables['version'] != CACHE_VERSION or tables['sources'] != sources:
+            raise ValueError("table cache was built from other data files")
+        roots = tables['roots'].split("\n") if tables['roots'] else []
+        self.pos = dict(zip(roots, [pos or None for pos in tables['pos'].split("\n")]))
+        self.root_suffix = dict(zip(roots, [suffix or None for suffix in tables['root_suffix'].split("\n")]))
+        self.suffixes = list(tables['suffixes'])
+        self.suffix_rule_numbers = dict(tables['suffix_rule_numbers'])
+        self.rules = {
+            int(num): Rule(type=type_rule, subrule=subrule, morph=morph, tag=tag, ignore=ignore,
+                           strip_rule=tuple(StripRule(delete, insert) for delete, insert in strip_rule))
+            for num, type_rule, subrule, morph, tag, ignore, strip_rule in tables['rules']
+        }
+        self.roots = roots
+        self.root_set = set(roots)
+        self.build_suffix_trie()
+        self.build_rule_automaton()
+
+    def load_tables(self, cache_dir=None, sources=None):
+        """
+        Fill the parsed tables, from the cache when it was built from the same files.
+
+        The cache is plain JSON data, named after the checksums of the data
+        files and recording them, so an edited file gets a new cache instead of
+        a stale one, and a file in a shared cache directory can at worst hold
+        wrong tables, never run code. It is written atomically; a cache that
+        cannot be read or written is only skipped.
+
+        :param cache_dir: directory of the cache, None always parses the files
+        :param sources: checksums of the data files, see data_checksums.source_checksums;
+                        the cache is only used with them
+        """
+        if not cache_dir or sources is None:
+            self.parse_files()
+            return
+
+        key = hashlib.sha256(json.dumps([CACHE_VERSION, sources], sort_keys=True).encode("utf-8")).hexdigest()
+        cache_file_name = os.path.join(cache_dir, "morph-{}.json".format(key[:16]))
+        try:
+            with open(cache_file_name, "r", encoding="utf-8") as f:
+                self._restore_tables(json.load(f), sources)
+            return
+        except Exception:
+            # Missing, truncated, stale or malformed: whatever reading it
+            # raises, parse the files instead, into empty tables
+            self.roots, self.root_set, self.pos, self.root_suffix = [], set(), {}, {}
+            self.suffixes, self.suffix_rule_numbers, self.rules = [], {}, {}
+
+        self.parse_files()
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_file_name = "{}.{}.tmp".format(cache_file_name, os.getpid())
+            with open(tmp_file_name, "w", encoding="utf-8") as f:
+                json.dump(self._dump_tables(sources), f, ensure_ascii=False)
+            os.replace(tmp_file_name, cache_file_name)
+        except OSError:
+            pass
+
+    def __init__(self, root_file_name, suffix_file_name, suffix_rule_file_name, memo_size=100000, max_depth=3,
+                 index_file_name=None, cache_dir=None, sources=None):
         """
         Initialize the morphological analyzer with linguistic data files.
 
         :param root_file_name: File containing root words with POS tags
         :param suffix_file_name: File mapping suffixes to rule numbers  
         :param suffix_rule_file_name: File defining morphological transformation rules
+        :param memo_size: Number of analyzed surface forms to remember, 0 disables memoization
+        :param max_depth: Most strip rules applied to one word, 0 keeps to literal suffix matches
+        :param index_file_name: Full-form index built by build_fullform_index.py, used when it
+                                matches the data files and max_depth
+        :param cache_dir: Directory for a cache of the parsed data files, keyed by their
+                          checksums; None parses the files every time
+        :param sources: Checksums of the three data files (see data_checksums.source_checksums),
+                        which the index and the cache are checked against; neither is used without them
         """
-        # Core data structures
+        self.root_file_name = root_file_name
+        self.suffix_file_name = suffix_file_name
         self.suffix_rule_file_name = suffix_rule_file_name
+
+        # Parsed data files, see load_tables
         self.roots = []                    # List of root words
+        self.root_set = set()              # Same roots, for constant time membership tests
         self.pos = {}                      # Mapping: root -> POS tag (NN, VF, ADJ, etc.)
         self.root_suffix = {}              # Mapping: root -> suffix (if any)
+        self.suffixes = []                 # List of suffix forms
+        self.suffix_rule_numbers = {}      # Mapping: suffix -> rule number
+        self.rules = {}                    # Mapping: rule number -> Rule
+        self.suffix_trie = None            # Reverse trie over the suffixes
+        self.rule_automaton = None         # Reverse trie over the strip rules
+        self.load_tables(cache_dir, sources)
+        self.max_depth = max_depth
 
-        self.root_file_name = root_file_name
-        # Load root words and their POS tags
-        self.read_root_list()
+        self.memo_size = memo_size
+        self._memo = {}                    # Mapping: surface form -> analyze() result
+        self._derivation_memo = {}         # Mapping: (form, depth) -> derivations() result
+
+        # Precomputed analyses of the forms one suffix away from a root
+        self.full_form_index = None
+        if index_file_name and sources is not None:
+            index = FullFormIndex.open(index_file_name, sources)
+            if index is not None and index.max_depth == max_depth:
+                self.full_form_index = index
+
+
+    def _analyze(self, word):
+        analyses = []
+        is_root = word in self.root_set
+        # Check if the word is directly in the root list
+        if is_root:
+            analyses.append(Analysis('Root Word', word, '', self.pos.get(word, "Unknown"), ''))
+
+        # Try to find possible roots by removing suffixes
+        for suffix in self.matching_suffixes(word):
+            potential_root = word[:-len(suffix)]
+            if potential_root in self.root_set:
+                pos = self.pos.get(potential_root, "Unknown")
+                rule = self.suffix_rule_numbers.get(suffix, "Unknown")
+                analyses.append(Analysis('Root + Suffix', potential_root, suffix, pos, rule))
+
+        # Apply the strip rules, possibly several in a row, for stem changes
+        # and stacked suffixes the literal match above cannot see
+        if self.max_depth > 0:
+            seen = {(analysis.root, analysis.suffix, analysis.rule) for analysis in analyses}
+            for root, suffixes, rules in self.derivations(word, self.max_depth):
+                suffix, rule = "+".join(suffix for suffix in suffixes if suffix), "+".join(rules)
+                if (root, suffix, rule) in seen:
+                    continue
+                seen.add((root, suffix, rule))
+                analysis_type = 'Root + Suffix' if len(suffixes) == 1 else 'Root + Suffixes'
+                analyses.append(Analysis(analysis_type, root, suffix, self.pos.get(root, "Unknown"), rule))
+
+        return is_root, tuple(analyses)
+
+    def analyze(self, word):
+        """
+        Find the root and suffix analyses of a single word.
+
+        Forms in the full-form index are looked up, the others go through the
+        rules. Results are memoized per surface form; once memo_size forms are
+        remembered the memo is dropped and starts over.
+
+        :param word: Nepali word, e.g. घरहरू
+        :return: (is_root, analyses) where analyses is a tuple of Analysis, empty if nothing matched
+        """
+        result = self._memo.get(word)
+        if result is None:
+            found = self.full_form_index.lookup(word) if self.full_form_index is not None else None
+            if found is not None:
+                result = (word in self.root_set, tuple(
+                    Analysis(analysis_type, root, suffix, self.pos.get(root, "Unknown"), rule)
+                    for analysis_type, root, suffix, rule in found))
+            else:
+                result = self._analyze(word)
+            if self.memo_size > 0:
+                if len(self._memo) >= self.memo_size:
+                    self._memo.clear()
+                self._memo[word] = result
+        return result
+
+    def analyze_many(self, words):
+        """
+        Analyze a list of words, each distinct word only once.
+
+        :param words: list of Nepali words, may contain repeats
+        :return: list of analyze() results in the same order as words
+        """
+        results = {word: self.analyze(word) for word in dict.fromkeys(words)}
+        return [results[word] for word in words]
+
+    def analyze_word(self, word):
+        """
+        Find the root and suffix analyses of a single word.
+
+        :param word: Nepali word, e.g. घरहरू
+        :return: dict with the word, whether it is a root, and its analyses
+        """
+        return analysis_to_dict(word, self.analyze(word))
+
+
+def analysis_to_dict(word, result):
+    """
+    Serialize an analyze() result to the dict returned by the API.
+
+    A word without any analysis gets a single 'Unknown' entry.
+
+    :param word: the analyzed word
+    :param result: (is_root, analyses) as returned by Morph.analyze
+    :return: dict with the word, whether it is a root, and its analyses
+    """
+    is_root, analyses = result
+    if not analyses:
+        analyses = (Analysis('Unknown', '-', '-', 'Not found', '-'),)
+    return {
+        'word': word,
+        'is_root': is_root,
+        'analyses': [analysis._asdict() for analysis in analyses]
+    }
+
+
+# Analyzer owned by a process pool worker, see init_worker.
+_worker_morph = None
+
+
+def init_worker(root_file_name, suffix_file_name, suffix_rule_file_name, index_file_name=None, cache_dir=None,
+                sources=None):
+    """Process pool initializer: load the data files once per worker process."""
+    global _worker_morph
+    _worker_morph = Morph(root_file_name, suffix_file_name, suffix_rule_file_name,
+                          index_file_name=index_file_name, cache_dir=cache_dir, sources=sources)
 
-        # Suffix processing
-        self.suffixes = []                 # List of suffix forms
-        self.suffix_rules = {}             # Mapping: suffix -> rule_number OR rule_number -> rule_data
-        self.suffix_file_name = suffix_file_name
-        self.read_suffix_list()           # Load suffix -> rule mappings
-        self.read_suffix_rule()           # Load rule definitions and transformations
 
+def analyze_words(words):
+    """Process pool task: analyze a chunk of words with the worker's analyzer."""
+    return _worker_morph.analyze_many(words)
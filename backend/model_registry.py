@@ -0,0 +1,175 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+# Seconds before a failed model is loaded again, doubled after every further
+# failure up to MODEL_RETRY_MAX_SECONDS
+MODEL_RETRY_SECONDS = float(os.environ.get("MODEL_RETRY_SECONDS", 10))
+MODEL_RETRY_MAX_SECONDS = float(os.environ.get("MODEL_RETRY_MAX_SECONDS", 600))
+
+
+def parse_enabled_models(value, known_models):
+    """
+    Models named in a comma separated setting such as ENABLED_MODELS, in the
+    order of known_models; unknown names are logged and ignored.
+    """
+    names = [name.strip().lower() for name in value.split(",") if name.strip()]
+    for name in names:
+        if name not in known_models:
+            logger.warning(f"Ignoring unknown or unsupported model '{name}'")
+    return [name for name in known_models if name in names]
+
+
+class ModelSlot:
+    """
+    One model with its own loader, lock, state and error.
+
+    The loader runs at most once at a time. A failed load is retried by a
+    later load() or load_async() call, so a transient download error does not
+    disable the endpoint for the life of the process, but only once
+    retry_seconds have passed since the failure, doubling after each further
+    failure up to max_retry_seconds, so a broken hub or disk does not get a new
+    download attempt per request. The error of the last failed load is kept
+    until a load succeeds, so it is reported in between.
+    """
+
+    def __init__(self, name, loader, retry_seconds=MODEL_RETRY_SECONDS, max_retry_seconds=MODEL_RETRY_MAX_SECONDS):
+        self.name = name
+        self.loader = loader
+        self.retry_seconds = max(0.0, retry_seconds)
+        self.max_retry_seconds = max(self.retry_seconds, max_retry_seconds)
+        self.value = None
+        self.state = NOT_LOADED
+        self.error = None
+        self.load_seconds = None
+        self.failures = 0        # failed loads since the last success
+        self.failed_at = None    # time.monotonic() of the last failure
+        self._load_lock = threading.Lock()   # held while the loader runs
+        self._state_lock = threading.Lock()  # guards state changes
+
+    def retry_in(self):
+        """Seconds until a failed model may be loaded again, 0 when it may be now."""
+        if self.state != FAILED or self.failed_at is None:
+            return 0.0
+        delay = min(self.retry_seconds * 2 ** (self.failures - 1), self.max_retry_seconds)
+        return max(0.0, self.failed_at + delay - time.monotonic())
+
+    def load(self):
+        """
+        Load the model in the calling thread unless it is ready; returns it, or
+        None on failure or while a failed load is backing off.
+        """
+        if self.state == READY:
+            return self.value
+
+        with self._load_lock:
+            if self.state == READY:
+                return self.value
+            with self._state_lock:
+                if self.retry_in() > 0:
+                    return None
+                self.state = LOADING
+
+            logger.info(f"Loading model '{self.name}'...")
+            start = time.perf_counter()
+            try:
+                value = self.loader()
+            except Exception as e:
+                with self._state_lock:
+                    self.load_seconds = time.perf_counter() - start
+                    self.error = str(e)
+                    self.failures += 1
+                    self.failed_at = time.monotonic()
+                    self.state = FAILED
+                logger.error(f"Error loading model '{self.name}' (attempt {self.failures}, "
+                             f"retrying in {self.retry_in():.0f}s): {str(e)}")
+                return None
+
+            with self._state_lock:
+                self.value = value
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self.failures = 0
+                self.failed_at = None
+                self.state = READY
+            logger.info(f"Model '{self.name}' loaded in {self.load_seconds:.2f}s")
+            return value
+
+    def load_async(self):
+        """
+        Start loading in a background thread unless the model is ready, already
+        loading or backing off after a failed load.
+        """
+        with self._state_lock:
+            if self.state in (READY, LOADING) or self.retry_in() > 0:
+                return False
+            self.state = LOADING
+        threading.Thread(target=self.load, name=f"load-{self.name}", daemon=True).start()
+        return True
+
+    def status(self):
+        with self._state_lock:
+            return {
+                "state": self.state,
+                "ready": self.state == READY,
+                "error": self.error,
+                "failures": self.failures,
+                "retry_in": round(self.retry_in(), 1),
+                "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None
+            }
+
+
+class ModelRegistry:
+    """
+    Named models that load independently of each other, in parallel or on first use.
+
+    Endpoints backed by a cheap rule-based model call load() and get it right
+    away; endpoints backed by a large download call load_async() and answer
+    503 until get() returns the model.
+    """
+
+    def __init__(self, retry_seconds=MODEL_RETRY_SECONDS, max_retry_seconds=MODEL_RETRY_MAX_SECONDS):
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._slots = {}
+
+    def register(self, name, loader):
+        """Add a model; loader takes no arguments and returns the loaded model or raises."""
+        self._slots[name] = ModelSlot(name, loader, self.retry_seconds, self.max_retry_seconds)
+        return self._slots[name]
+
+    def __contains__(self, name):
+        return name in self._slots
+
+    def names(self):
+        return list(self._slots)
+
+    def slot(self, name):
+        return self._slots[name]
+
+    def get(self, name):
+        """The loaded model, or None if it is not ready yet or not registered."""
+        slot = self._slots.get(name)
+        return slot.value if slot is not None and slot.state == READY else None
+
+    def load(self, name):
+        return self._slots[name].load()
+
+    def load_async(self, name):
+        return self._slots[name].load_async()
+
+    def load_all_async(self):
+        """Start every model loading at once, each in its own thread."""
+        for slot in self._slots.values():
+            slot.load_async()
+
+    def status(self):
+        return {name: slot.status() for name, slot in self._slots.items()}
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the corpus lemmatization CLI (model/NepaliLemmatizer/lemmatize_corpus.py)
+
+Runs the CLI on a small JSONL file with bad lines in it and checks that every
+line gets an output record, bad ones as {"error": ...}, and that --resume
+carries on after them. Needs no server.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CLI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model', 'NepaliLemmatizer')
+
+GOOD_LINE = '{"text": "नेपालको राजधानी"}\n'.encode('utf-8')
+LINES = [
+    GOOD_LINE,
+    b'[1, 2]\n',                       # not an object
+    b'{"text": 5}\n',                  # field is not a string
+    b'{bad json\n',                    # not JSON
+    b'{"text": "\xff\xfe"}\n',         # invalid UTF-8
+    '{"text": "घरहरू"}\n'.encode('utf-8'),
+]
+
+
+def run_cli(input_path, output_path, *args):
+    return subprocess.run(
+        [sys.executable, 'lemmatize_corpus.py', input_path, '-o', output_path, '--format', 'jsonl', *args],
+        cwd=CLI_DIR, capture_output=True, text=True
+    )
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_bad_lines():
+    """Bad lines are written as error records and the run goes on"""
+    print("🔍 Testing a corpus with bad lines...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'corpus.jsonl')
+        output_path = os.path.join(tmp, 'out.jsonl')
+        with open(input_path, 'wb') as f:
+            f.write(b''.join(LINES))
+
+        result = run_cli(input_path, output_path)
+        assert result.returncode == 0, result.stderr
+        records = read_records(output_path)
+        assert len(records) == len(LINES), records
+        assert records[0]['lemmas'] == ['नेपाल', 'राजधानी'], records[0]
+        assert all('error' in record for record in records[1:4]), records
+        assert 'lemmas' in records[4], records[4]
+        assert records[-1]['lemmas'] == ['घर'], records[-1]
+        offset = 0
+        for line, record in zip(LINES, records):
+            assert (record['offset'], record['next_offset']) == (offset, offset + len(line)), record
+            offset += len(line)
+        print(f"✅ {len(records)} records, {sum('error' in record for record in records)} errors")
+
+
+def test_resume_after_bad_lines():
+    """--resume continues from the offsets of an error record"""
+    print("🔍 Testing --resume after bad lines...")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'corpus.jsonl')
+        output_path = os.path.join(tmp, 'out.jsonl')
+        with open(input_path, 'wb') as f:
+            f.write(b''.join(LINES[:3]))
+        assert run_cli(input_path, output_path).returncode == 0
+
+        with open(input_path, 'ab') as f:
+            f.write(b''.join(LINES[3:]))
+        result = run_cli(input_path, output_path, '--resume')
+        assert result.returncode == 0, result.stderr
+        records = read_records(output_path)
+        assert [record['offset'] for record in records] == [sum(map(len, LINES[:i])) for i in range(len(LINES))], records
+        print(f"✅ Resumed at byte offset {records[3]['offset']}")
+
+
+if __name__ == "__main__":
+    test_bad_lines()
+    test_resume_after_bad_lines()
@@ -55,5 +55,34 @@ def test_lemmatizer():
     print("\n" + "=" * 50)
     print("✅ All tests completed!")
 
+def test_lemmatizer_batch():
+    """Test batch mode: several texts in one request, repeated words lemmatized once"""
+    texts = [
+        "किताबहरु पढ्दै छु",
+        "केटाहरु खेल्दै छन्",
+        "किताबहरु पढ्दै छन्"
+    ]
+
+    print("\nTesting NepaliLemmatizer API batch mode...")
+    print("=" * 50)
+
+    try:
+        response = requests.post(API_URL, json={"texts": texts}, timeout=30)
+
+        if response.status_code == 200:
+            data = response.json()
+            print(f"✅ Texts: {data['text_count']}, Words: {data['word_count']}, Unique: {data['unique_word_count']}")
+            for result in data['results']:
+                print(f"   '{result['original_text']}' → '{result['lemmatized_text']}'")
+            assert len(data['results']) == len(texts)
+        else:
+            print(f"❌ Error {response.status_code}: {response.text}")
+
+    except requests.exceptions.ConnectionError:
+        print("❌ Connection Error: Make sure the Flask server is running on http://localhost:5001")
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Request Error: {e}")
+
 if __name__ == "__main__":
     test_lemmatizer()
+    test_lemmatizer_batch()
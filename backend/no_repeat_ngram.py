@@ -0,0 +1,70 @@
+class IncrementalNoRepeatNGramLogitsProcessor:
+    """
+    Logits processor that forbids repeating any n-gram, like transformers'
+    NoRepeatNGramLogitsProcessor, without rebuilding the n-grams every step.
+
+    Each row keeps a table of the n-grams seen so far, as tensors of their
+    first n - 1 tokens and of the token that followed. A call only adds the
+    n-grams ending in tokens appended since the previous call, then bans the
+    tokens that followed every earlier occurrence of the last n - 1 tokens
+    with one tensor comparison. The banned tokens, and so the scores, are the
+    same as the stock processor's.
+
+    The table belongs to the rows of the first call, so rows must keep their
+    order between calls, as in greedy and sampling search but not beam search;
+    a batch of another size or a shorter sequence starts a new table.
+    """
+
+    def __init__(self, ngram_size):
+        if not isinstance(ngram_size, int) or ngram_size <= 0:
+            raise ValueError(f"`ngram_size` has to be a strictly positive integer, but is {ngram_size}")
+        self.ngram_size = ngram_size
+        self._prefixes = None  # (batch, capacity, n - 1)
+        self._next_tokens = None  # (batch, capacity)
+        self._count = 0
+        self._length = 0
+
+    def _reset(self, input_ids):
+        batch_size = input_ids.shape[0]
+        capacity = max(16, input_ids.shape[1])
+        self._prefixes = input_ids.new_empty(batch_size, capacity, self.ngram_size - 1)
+        self._next_tokens = input_ids.new_empty(batch_size, capacity)
+        self._count = 0
+        self._length = 0
+
+    def _extend(self, input_ids):
+        """Add the n-grams that end in tokens appended since the last call"""
+        length = input_ids.shape[1]
+        if self._prefixes is None or input_ids.shape[0] != self._prefixes.shape[0] or length < self._length:
+            self._reset(input_ids)
+        if length == self._length:
+            return
+        if length < self.ngram_size:
+            self._length = length
+            return
+
+        # n-grams starting at self._count onwards are new
+        ngrams = input_ids[:, self._count:].unfold(1, self.ngram_size, 1)
+        count = self._count + ngrams.shape[1]
+        if count > self._next_tokens.shape[1]:
+            capacity = max(count, 2 * self._next_tokens.shape[1])
+            prefixes = self._prefixes.new_empty(self._prefixes.shape[0], capacity, self.ngram_size - 1)
+            next_tokens = self._next_tokens.new_empty(self._next_tokens.shape[0], capacity)
+            prefixes[:, :self._count] = self._prefixes[:, :self._count]
+            next_tokens[:, :self._count] = self._next_tokens[:, :self._count]
+            self._prefixes, self._next_tokens = prefixes, next_tokens
+        self._prefixes[:, self._count:count] = ngrams[:, :, :-1]
+        self._next_tokens[:, self._count:count] = ngrams[:, :, -1]
+        self._count = count
+        self._length = length
+
+    def __call__(self, input_ids, scores):
+        self._extend(input_ids)
+        if input_ids.shape[1] + 1 < self.ngram_size or not self._count:
+            return scores
+
+        current = input_ids[:, input_ids.shape[1] - self.ngram_size + 1:]
+        matches = (self._prefixes[:, :self._count] == current.unsqueeze(1)).all(dim=-1)
+        rows, positions = matches.nonzero(as_tuple=True)
+        scores[rows, self._next_tokens[rows, positions]] = -float("inf")
+        return scores
@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+
+import torch
+
+
+class PrefixCache:
+    """
+    Bounded LRU of key/value caches for prompt prefixes.
+
+    Prompts are cut into blocks of block_size tokens. Each block's keys and
+    values are stored once, under the token ids of the whole prefix up to the
+    end of that block, so prompts sharing a long instruction prefix share its
+    blocks and only the text after it has to be prefilled. Memory is counted
+    in bytes of stored tensors; the least recently used blocks are evicted
+    first. A hit touches a prefix's blocks from last to first, so a block is
+    never older than the blocks after it and eviction trims prefixes from the end.
+
+    Caches are the legacy tuple of (key, value) tensors shaped
+    (batch, heads, length, head dim), with a batch of one.
+    """
+
+    def __init__(self, max_bytes, block_size=16):
+        self.max_bytes = max_bytes
+        self.block_size = max(1, block_size)
+        self._blocks = OrderedDict()  # token ids up to the block end -> (past of the block, bytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.prompt_tokens = 0
+        self.saved_tokens = 0
+
+    def lookup(self, ids):
+        """
+        :param ids: prompt token ids
+        :return: (number of cached tokens, their past or None); at least the
+                 last token is always left to prefill
+        """
+        keys = []
+        with self._lock:
+            for end in range(self.block_size, len(ids), self.block_size):
+                key = tuple(ids[:end])
+                if key not in self._blocks:
+                    break
+                keys.append(key)
+            for key in reversed(keys):
+                self._blocks.move_to_end(key)
+            blocks = [self._blocks[key][0] for key in keys]
+            self.lookups += 1
+            self.hits += bool(blocks)
+            self.prompt_tokens += len(ids)
+            self.saved_tokens += len(blocks) * self.block_size
+
+        if not blocks:
+            return 0, None
+        past = tuple(
+            (torch.cat([block[layer][0] for block in blocks], dim=2),
+             torch.cat([block[layer][1] for block in blocks], dim=2))
+            for layer in range(len(blocks[0]))
+        )
+        return len(blocks) * self.block_size, past
+
+    def store(self, ids, past, cached=0):
+        """
+        Add the full blocks of a prefilled prompt that are not cached yet.
+
+        Only as many leading blocks as fit in max_bytes are kept, and they are
+        touched from last to first like a hit, so storing a long prompt evicts
+        other prompts' blocks rather than its own first blocks.
+
+        :param ids: prompt token ids
+        :param past: cache of the whole prompt
+        :param cached: tokens that came from lookup, whose blocks are already stored
+        """
+        if self.max_bytes <= 0:
+            return
+        keys, blocks, total = [], {}, 0
+        for end in range(self.block_size, len(ids) + 1, self.block_size):
+            start = end - self.block_size
+            block = tuple(
+                (key_states[:, :, start:end], value_states[:, :, start:end])
+                for key_states, value_states in past
+            )
+            size = sum(key_states.nbytes + value_states.nbytes for key_states, value_states in block)
+            total += size
+            if total > self.max_bytes:
+                break
+            key = tuple(ids[:end])
+            keys.append(key)
+            if end > cached:
+                blocks[key] = (block, size)
+
+        with self._lock:
+            for key, (block, size) in blocks.items():
+                if key not in self._blocks:
+                    # Copy the slice so the block does not keep the whole prompt's cache alive
+                    self._blocks[key] = (tuple((k.clone(), v.clone()) for k, v in block), size)
+                    self.bytes += size
+            for key in reversed(keys):
+                if key in self._blocks:
+                    self._blocks.move_to_end(key)
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._blocks.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "blocks": len(self._blocks),
+                "block_size": self.block_size,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "evictions": self.evictions,
+                "prefill_tokens": self.prompt_tokens - self.saved_tokens,
+                "prefill_tokens_saved": self.saved_tokens
+            }
@@ -0,0 +1,460 @@
+"""
+Rule-based services: the lemmatizer and the morphological analyzer (stemmer).
+
+Everything here is pure Python with no ML dependencies, so it is shared by the
+full app (app.py) and the torch-free app (lite_app.py): the /lemmatize and
+/stemmer routes live in the rule_based_routes blueprint, together with the
+response helpers and the /, /health and /model-info payloads both apps return.
+An app using the blueprint keeps its ModelRegistry in app.extensions["models"]
+and the names of the models it serves in app.config["ENABLED_MODELS"].
+"""
+from flask import Blueprint, current_app, request, jsonify
+import atexit
+import logging
+import sys
+import os
+import re
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Add the lemmatizer path to sys.path
+sys.path.append(os.path.join(BACKEND_DIR, 'model', 'NepaliLemmatizer'))
+
+# Add the stemmer path to sys.path
+sys.path.append(os.path.join(BACKEND_DIR, 'model', 'stemmer'))
+
+# Add the model path to sys.path, for the data file checksums both caches are keyed by
+sys.path.append(os.path.join(BACKEND_DIR, 'model'))
+from data_checksums import source_checksums
+
+try:
+    from main import get_lexicon_sources, lemmatize_word, lemmatize_words
+    from main import init_worker as init_lemmatizer_worker
+    from main import lemmatizer as nepali_lemmatizer
+    lemmatizer_available = True
+except ImportError as e:
+    logging.warning(f"Could not import lemmatizer: {e}")
+    lemmatizer_available = False
+
+try:
+    from morph import Morph
+    from morph import analysis_to_dict
+    from morph import analyze_words as analyze_stemmer_chunk
+    from morph import init_worker as init_stemmer_worker
+    stemmer_available = True
+except ImportError as e:
+    logging.warning(f"Could not import stemmer: {e}")
+    stemmer_available = False
+
+from analyzer_pool import AnalyzerPool, available_cpus
+from model_registry import LOADING
+from word_cache import WordCache
+
+logger = logging.getLogger(__name__)
+
+RULE_BASED_MODELS = ("lemmatize", "stemmer")
+
+# Bounded per-word caches in front of the rule-based analyzers; the hot set is
+# saved on shutdown and recomputed on startup.
+WORD_CACHE_DIR = os.environ.get(
+    "WORD_CACHE_DIR", os.path.join(BACKEND_DIR, '.cache', 'word_cache')
+)
+lemma_cache = WordCache(
+    "lemmatize",
+    max_size=int(os.environ.get("LEMMA_CACHE_SIZE", 50000)),
+    path=os.path.join(WORD_CACHE_DIR, 'lemmatize.json')
+)
+stemmer_cache = WordCache(
+    "stemmer",
+    max_size=int(os.environ.get("STEMMER_CACHE_SIZE", 50000)),
+    path=os.path.join(WORD_CACHE_DIR, 'stemmer.json')
+)
+
+
+word_caches = {"lemmatize": lemma_cache, "stemmer": stemmer_cache}
+# Rule-based models registered in this process, see register_models
+served_models = set()
+
+
+def save_word_caches():
+    """
+    Persist the hot set of the word caches of the models this process
+    serves; a replica without them leaves the shared hot sets alone.
+    """
+    for name in RULE_BASED_MODELS:
+        if name in served_models:
+            word_caches[name].save()
+
+
+atexit.register(save_word_caches)
+
+STEMMER_FILES = (
+    os.path.join(BACKEND_DIR, 'model', 'stemmer', 'files', 'root'),
+    os.path.join(BACKEND_DIR, 'model', 'stemmer', 'files', 'suffix.txt'),
+    os.path.join(BACKEND_DIR, 'model', 'stemmer', 'files', 'suffix_rule.txt'),
+)
+# Full-form index from model/stemmer/build_fullform_index.py, skipped when missing or stale
+STEMMER_INDEX = os.environ.get(
+    "STEMMER_INDEX", os.path.join(BACKEND_DIR, 'model', 'stemmer', 'files', 'fullform.index')
+)
+# Parsed stemmer data files, reused by every process while the files are unchanged
+STEMMER_CACHE_DIR = os.environ.get(
+    "STEMMER_CACHE_DIR", os.path.join(BACKEND_DIR, '.cache', 'stemmer')
+)
+
+# Requests with at least this many distinct uncached words are spread over a
+# process pool; the rule-based analyzers are pure Python and bound by the GIL.
+PARALLEL_MIN_WORDS = int(os.environ.get("PARALLEL_MIN_WORDS", 20000))
+ANALYZER_PROCESSES = int(os.environ.get("ANALYZER_PROCESSES", 0)) or available_cpus()
+lemma_pool = AnalyzerPool(
+    "lemmatize", lemmatize_words, initializer=init_lemmatizer_worker, processes=ANALYZER_PROCESSES
+) if lemmatizer_available else None
+stemmer_pool = AnalyzerPool(
+    "stemmer", analyze_stemmer_chunk, initializer=init_stemmer_worker, initargs=STEMMER_FILES + (STEMMER_INDEX, STEMMER_CACHE_DIR),
+    processes=ANALYZER_PROCESSES
+) if stemmer_available else None
+
+
+def use_pool(pool, words):
+    """Whether a list of words is large enough to be worth a process pool."""
+    return pool is not None and ANALYZER_PROCESSES > 1 and len(words) >= PARALLEL_MIN_WORDS
+
+
+def shutdown_pools():
+    for pool in (lemma_pool, stemmer_pool):
+        if pool is not None:
+            pool.shutdown()
+
+
+atexit.register(shutdown_pools)
+
+
+def load_lemmatizer():
+    """Load the lemmatizer lexicon and warm its word cache"""
+    sources = source_checksums(get_lexicon_sources())
+    nepali_lemmatizer.load(sources)
+    # Pool workers, started later on a large request, map the same snapshot
+    lemma_pool.initargs = (sources,)
+    lemma_cache.warm(lemmatize_word)
+    return nepali_lemmatizer
+
+
+def load_stemmer():
+    """Load the morphological analyzer and warm its word cache"""
+    sources = source_checksums(STEMMER_FILES)
+    stemmer = Morph(*STEMMER_FILES, index_file_name=STEMMER_INDEX, cache_dir=STEMMER_CACHE_DIR, sources=sources)
+    # Pool workers, started later on a large request, check the index and cache the same way
+    stemmer_pool.initargs = STEMMER_FILES + (STEMMER_INDEX, STEMMER_CACHE_DIR, sources)
+    index_size = len(stemmer.full_form_index) if stemmer.full_form_index is not None else 0
+    logger.info(f"Stemmer uses {index_size} indexed forms")
+    stemmer_cache.warm(stemmer.analyze)
+    return stemmer
+
+
+def register_models(models, enabled_models):
+    """Register the enabled rule-based models and start loading them; they need no download."""
+    if lemmatizer_available and "lemmatize" in enabled_models:
+        models.register("lemmatize", load_lemmatizer)
+    if stemmer_available and "stemmer" in enabled_models:
+        models.register("stemmer", load_stemmer)
+    for name in RULE_BASED_MODELS:
+        if name in models:
+            served_models.add(name)
+            models.load_async(name)
+
+
+def current_models():
+    """The ModelRegistry of the app handling the request"""
+    return current_app.extensions["models"]
+
+
+def model_enabled(name):
+    return name in current_app.config["ENABLED_MODELS"]
+
+
+def model_disabled(name):
+    """404 response for an endpoint whose model this worker does not serve"""
+    return jsonify({
+        "error": "Endpoint disabled",
+        "message": f"The '{name}' model is not enabled on this server",
+        "enabled_models": current_app.config["ENABLED_MODELS"]
+    }), 404
+
+
+def model_not_ready(name, error, message):
+    """503 response for a model that is still loading or failed to load"""
+    status = current_models().slot(name).status()
+    return jsonify({
+        "error": error,
+        "message": message,
+        "model_state": status["state"],
+        "models_loading": status["state"] == LOADING,
+        "last_error": status["error"],
+        "retry_in": status["retry_in"]
+    }), 503
+
+
+def service_index():
+    """Payload of / for the models this worker serves"""
+    enabled_models = current_app.config["ENABLED_MODELS"]
+    return {
+        "status": "ok", 
+        "service": "nlp-backend",
+        "message": "Nepali NLP Backend API is running",
+        "version": "1.0.0",
+        "endpoints": {
+            "health": "/health",
+            "models": "/model-info",
+            **{name: f"/{name}" for name in enabled_models}
+        },
+        "enabled_models": enabled_models
+    }
+
+
+def health_status(torch_available=False, torch_import_error=None):
+    """Payload of /health; the torch fields are filled in by the full app"""
+    models = current_models()
+    status = models.status()
+    errors = [f"{name}: {model['error']}" for name, model in status.items() if model["error"]]
+    return {
+        "status": "healthy",
+        "models_loading": any(model["state"] == LOADING for model in status.values()),
+        "models_ready": all(model["ready"] for model in status.values()),
+        "model_load_error": "; ".join(errors) or None,
+        "models": status,
+        "enabled_models": current_app.config["ENABLED_MODELS"],
+        "torch_available": torch_available,
+        "torch_import_error": torch_import_error,
+        "model_loaded": models.get("generate") is not None,
+        "ner_loaded": models.get("ner") is not None,
+        "lemmatizer_loaded": models.get("lemmatize") is not None,
+        "stemmer_loaded": models.get("stemmer") is not None,
+        "aspect_loaded": models.get("aspect") is not None,
+        "caches": {
+            "lemmatize": lemma_cache.stats(),
+            "stemmer": stemmer_cache.stats()
+        },
+        "message": "NLP Models API is running"
+    }
+
+
+def rule_based_model_info():
+    """/model-info entries of the enabled rule-based models"""
+    models = current_models()
+    info = {}
+    if model_enabled("lemmatize"):
+        info["lemmatizer"] = {
+            "model_name": "NepaliLemmatizer",
+            "model_type": "Lemmatization",
+            "description": "Rule-based lemmatizer for Nepali words",
+            "model_loaded": models.get("lemmatize") is not None
+        }
+    if model_enabled("stemmer"):
+        info["stemmer"] = {
+            "model_name": "NepaliStemmer",
+            "model_type": "Morphological Analysis",
+            "description": "Morphological analyzer for Nepali words to find roots and suffixes",
+            "model_loaded": models.get("stemmer") is not None
+        }
+    return info
+
+
+def register_error_handlers(app):
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({
+            "error": "Endpoint not found",
+            "message": "The requested endpoint does not exist"
+        }), 404
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({
+            "error": "Internal server error",
+            "message": "An unexpected error occurred"
+        }), 500
+
+
+rule_based_routes = Blueprint("rule_based", __name__)
+
+
+def lemmatize_many_words(words):
+    """Lemmatize a list of distinct words, in a process pool when the list is large"""
+    if use_pool(lemma_pool, words):
+        return lemma_pool.map(words)
+    return lemmatize_words(words)
+
+def lemmatize_unique_words(words):
+    """Lemmatize each distinct word once; a word that fails keeps itself as its lemma"""
+    try:
+        return lemma_cache.get_many_or_compute(words, lemmatize_many_words)
+    except Exception as e:
+        logger.warning(f"Batch lemmatization failed, retrying word by word: {str(e)}")
+
+    lemmas = {}
+    for word in dict.fromkeys(words):
+        try:
+            lemmas[word] = lemma_cache.get_or_compute(word, lemmatize_word)
+        except Exception as e:
+            logger.warning(f"Error lemmatizing word '{word}': {str(e)}")
+            # If lemmatization fails for a word, keep the original
+            lemmas[word] = word
+    return lemmas
+
+def build_lemmatize_result(text, words, lemmas):
+    """Scatter the lemmas of the unique words back onto one text"""
+    lemmatized_words = [
+        {"original": word, "lemma": lemmas[word.strip()]}
+        for word in words
+    ]
+    return {
+        "original_text": text,
+        "lemmatized_text": " ".join([item["lemma"] for item in lemmatized_words]),
+        "word_details": lemmatized_words,
+        "word_count": len(words)
+    }
+
+@rule_based_routes.route('/lemmatize', methods=['POST'])
+def lemmatize():
+    """Lemmatize Nepali words using NepaliLemmatizer.
+
+    Accepts either {"text": "..."} or, in batch mode, {"texts": ["...", ...]}.
+    Words are deduplicated across the whole request and lemmatized once.
+    """
+    if not model_enabled("lemmatize"):
+        return model_disabled("lemmatize")
+    try:
+        # Check if lemmatizer is available
+        if not lemmatizer_available:
+            return jsonify({
+                "error": "Lemmatizer not available",
+                "message": "NepaliLemmatizer could not be loaded"
+            }), 503
+        if current_models().load("lemmatize") is None:
+            return model_not_ready("lemmatize", "Lemmatizer not loaded", "NepaliLemmatizer could not be loaded")
+
+        # Get data from request
+        data = request.json
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
+
+        texts = data.get("texts")
+        if texts is not None:
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                return jsonify({"error": "'texts' must be a list of strings"}), 400
+            if not texts:
+                return jsonify({"error": "No texts provided"}), 400
+
+            logger.info(f"Lemmatizing batch of {len(texts)} texts...")
+
+            tokenized = [text.split() for text in texts]
+            lemmas = lemmatize_unique_words([word.strip() for words in tokenized for word in words])
+            results = [
+                build_lemmatize_result(text, words, lemmas)
+                for text, words in zip(texts, tokenized)
+            ]
+
+            logger.info(f"Lemmatized {len(texts)} texts ({len(lemmas)} unique words) successfully!")
+
+            return jsonify({
+                "results": results,
+                "text_count": len(texts),
+                "word_count": sum(result["word_count"] for result in results),
+                "unique_word_count": len(lemmas),
+                "success": True
+            })
+
+        text = data.get("text", "")
+        if not text:
+            return jsonify({"error": "No text provided"}), 400
+        
+        logger.info(f"Lemmatizing text: {text[:50]}...")
+
+        # Split text into words and lemmatize each distinct word once
+        words = text.split()
+        lemmas = lemmatize_unique_words([word.strip() for word in words])
+        result = build_lemmatize_result(text, words, lemmas)
+        
+        logger.info(f"Lemmatized {len(words)} words successfully!")
+
+        return jsonify({
+            **result,
+            "success": True
+        })
+
+    except Exception as e:
+        logger.error(f"Error during lemmatization: {str(e)}")
+        return jsonify({
+            "error": "Lemmatization failed",
+            "message": str(e)
+        }), 500
+
+def analyze_stemmer_words(words):
+    """Analyze a list of distinct words, in a process pool when the list is large"""
+    if use_pool(stemmer_pool, words):
+        return stemmer_pool.map(words)
+    return current_models().get("stemmer").analyze_many(words)
+
+@rule_based_routes.route('/stemmer', methods=['POST'])
+def analyze_stemmer():
+    """Analyze Nepali words using morphological analyzer (stemmer)"""
+    if not model_enabled("stemmer"):
+        return model_disabled("stemmer")
+    try:
+        # Check if stemmer is available; it is cheap, so it loads on first use
+        if not stemmer_available:
+            return jsonify({
+                "error": "Stemmer not loaded",
+                "message": "Stemmer model is not available"
+            }), 503
+        if current_models().load("stemmer") is None:
+            return model_not_ready("stemmer", "Stemmer not loaded", "Stemmer model is not available")
+
+        # Get data from request
+        data = request.json
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
+            
+        text = data.get("text", "")
+        if not text:
+            return jsonify({"error": "No text provided"}), 400
+
+        logger.info(f"Analyzing text with stemmer: {text[:50]}...")
+
+        # Extract Nepali words from input (remove punctuation and split)
+        words = re.findall(r'[\u0900-\u097F]+', text)
+        
+        if not words:
+            return jsonify({
+                "error": "No Nepali words found",
+                "message": "The input text does not contain any Nepali words"
+            }), 400
+
+        words = [word.strip() for word in words if word.strip()]
+        results = stemmer_cache.get_many_or_compute(words, analyze_stemmer_words)
+        analyzed_words = [analysis_to_dict(word, results[word]) for word in words]
+
+        # Create summary statistics
+        root_count = sum(1 for word in words if results[word][0])
+        analyzed_count = sum(1 for word in words if results[word][1])
+        
+        logger.info(f"Analyzed {len(words)} words with stemmer successfully!")
+
+        return jsonify({
+            "original_text": text,
+            "words": analyzed_words,
+            "statistics": {
+                "total_words": len(words),
+                "root_words": root_count,
+                "analyzed_words": analyzed_count,
+                "unknown_words": len(words) - analyzed_count
+            },
+            "success": True
+        })
+
+    except Exception as e:
+        logger.error(f"Error during stemmer analysis: {str(e)}")
+        return jsonify({
+            "error": "Stemmer analysis failed",
+            "message": str(e)
+        }), 500
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; saves are then only atomic, not merged in turn
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class WordCache:
+    """
+    Thread-safe, bounded LRU cache for per-word analysis results.
+
+    Nepali text is heavily Zipfian, so a few thousand surface forms cover most
+    requests. Each entry also counts its hits; on shutdown the most frequently
+    hit words are written to disk and recomputed on the next start, so a
+    restarted worker does not begin cold and never serves stale results.
+    """
+
+    def __init__(self, name, max_size=10000, path=None):
+        self.name = name
+        self.max_size = max_size
+        self.path = path
+        self._entries = OrderedDict()  # key -> [value, hits]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss."""
+        if self.max_size <= 0:
+            return compute(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry[1] += 1
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Compute outside the lock; a concurrent miss on the same key only costs a duplicate computation.
+        value = compute(key)
+        self._store(key, value, hits=0)
+        return value
+
+    def get_many_or_compute(self, keys, compute_many):
+        """
+        Return {key: value} for the distinct keys, computing all misses with a
+        single compute_many(list_of_keys) call that returns values in order.
+        """
+        keys = list(dict.fromkeys(keys))
+        if self.max_size <= 0:
+            return dict(zip(keys, compute_many(keys)))
+
+        results, missing = {}, []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry[1] += 1
+                    self.hits += 1
+                    results[key] = entry[0]
+                else:
+                    self.misses += 1
+                    missing.append(key)
+
+        if missing:
+            for key, value in zip(missing, compute_many(missing)):
+                self._store(key, value, hits=0)
+                results[key] = value
+        return results
+
+    def _store(self, key, value, hits):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = [value, hits]
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _read_hot_keys(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f).get("keys", [])
+
+    def save(self, limit=None):
+        """
+        Persist the hottest keys so the next process can warm up.
+
+        The keys hit in this process come first (most hits first), then the
+        hot set already in the file, then the rest of this cache, so a cold or
+        short-lived worker adds to what other workers saved instead of
+        replacing it. An empty or disabled cache leaves the file alone.
+        """
+        if not self.path or self.max_size <= 0:
+            return 0
+        with self._lock:
+            ranked = sorted(self._entries.items(), key=lambda item: item[1][1], reverse=True)
+        if not ranked:
+            return 0
+        limit = limit or self.max_size
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Workers sharing the file merge one at a time
+            with open(f"{self.path}.lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    saved = self._read_hot_keys() if os.path.exists(self.path) else []
+                except (OSError, ValueError):
+                    saved = []
+                hit_keys = [key for key, (_, hits) in ranked if hits > 0]
+                other_keys = [key for key, (_, hits) in ranked if hits == 0]
+                keys = list(dict.fromkeys(hit_keys + saved + other_keys))[:limit]
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"name": self.name, "keys": keys}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save {self.name} cache hot set: {str(e)}")
+            return 0
+        logger.info(f"Saved {len(keys)} hot {self.name} cache keys to {self.path}")
+        return len(keys)
+
+    def warm(self, compute):
+        """Recompute the hot set saved by a previous process, hottest last so it ends up most recent."""
+        if not self.path or self.max_size <= 0 or not os.path.exists(self.path):
+            return 0
+        try:
+            keys = self._read_hot_keys()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read {self.name} cache hot set: {str(e)}")
+            return 0
+
+        warmed = 0
+        for key in reversed(keys[:self.max_size]):
+            try:
+                self._store(key, compute(key), hits=0)
+                warmed += 1
+            except Exception as e:
+                logger.warning(f"Could not warm {self.name} cache entry '{key}': {str(e)}")
+        logger.info(f"Warmed {self.name} cache with {warmed} entries")
+        return warmed
@@ -0,0 +1,11 @@
+from lite_app import create_app
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO)
+
+app = create_app()
+
+if __name__ == "__main__":
+    port = int(os.environ.get('PORT', 8000))
+    app.run(host='0.0.0.0', port=port, debug=False)
@@ -12,10 +12,12 @@ const Chat = () => {
   const [messages, setMessages] = useState([]);
   const [inputValue, setInputValue] = useState("");
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
   const [showSamples, setShowSamples] = useState(false);
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
   const chatContainerRef = useRef(null);
+  const generateAbortRef = useRef(null);
   const [isAtBottom, setIsAtBottom] = useState(true);
 
   // Convert URL-friendly name back to display name
@@ -190,6 +192,11 @@ const Chat = () => {
     }, 100);
   }, []);
 
+  // Stop a running generation when leaving the chat; the backend cancels it on disconnect
+  useEffect(() => {
+    return () => generateAbortRef.current?.abort();
+  }, []);
+
   // No automatic scrolling for welcome message - let user see the page from top
 
   const handleSendMessage = async () => {
@@ -384,7 +391,9 @@ const Chat = () => {
           setMessages((prev) => [...prev, transliterationInfo]);
         }
 
-        // Call the Flask API
+        // Call the Flask API, streaming tokens as server-sent events
+        const abortController = new AbortController();
+        generateAbortRef.current = abortController;
         response = await fetch(
           `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.GENERATE}`,
           {
@@ -397,7 +406,9 @@ const Chat = () => {
               max_length: 150,
               temperature: 0.7,
               do_sample: true,
+              stream: true,
             }),
+            signal: abortController.signal,
           }
         );
 
@@ -405,18 +416,51 @@ const Chat = () => {
           throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        data = await response.json();
+        const botId = Date.now() + 1;
+        const showResponse = (text) => {
+          setMessages((prev) =>
+            prev.some((message) => message.id === botId)
+              ? prev.map((message) =>
+                  message.id === botId ? { ...message, text } : message
+                )
+              : [
+                  ...prev,
+                  { id: botId, text, sender: "bot", timestamp: new Date() },
+                ]
+          );
+        };
+
+        // Each event is "event: <name>\ndata: <json>" followed by a blank line
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let streamedText = "";
+        data = null;
+        while (!data) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          const events = buffer.split("\n\n");
+          buffer = events.pop();
+          for (const event of events) {
+            const name = event.match(/^event: (.*)$/m)?.[1];
+            const payload = JSON.parse(event.match(/^data: (.*)$/m)?.[1] || "{}");
+            if (name === "token") {
+              streamedText += payload.text;
+              setIsStreaming(true);
+              showResponse(streamedText.trimStart());
+            } else if (name === "done" || name === "error") {
+              data = payload;
+            }
+          }
+        }
 
-        if (data.success) {
-          const botResponse = {
-            id: Date.now() + 1,
-            text: data.response || "I'm sorry, I couldn't generate a response.",
-            sender: "bot",
-            timestamp: new Date(),
-          };
-          setMessages((prev) => [...prev, botResponse]);
+        if (data?.success) {
+          showResponse(
+            data.response || "I'm sorry, I couldn't generate a response."
+          );
         } else {
-          throw new Error(data.message || "Generation failed");
+          throw new Error(data?.message || "Generation failed");
         }
       }
     } catch (error) {
@@ -430,6 +474,8 @@ const Chat = () => {
       setMessages((prev) => [...prev, errorResponse]);
     } finally {
       setIsLoading(false);
+      setIsStreaming(false);
+      generateAbortRef.current = null;
       // Ensure input stays focused after response
       inputRef.current?.focus();
     }
@@ -683,7 +729,7 @@ const Chat = () => {
                 ))}
 
                 {/* Loading indicator */}
-                {isLoading && (
+                {isLoading && !isStreaming && (
                   <div className="flex justify-start">
                     <div className="bg-n-6 text-n-1 border border-n-5 rounded-2xl px-4 py-3">
                       <div className="flex items-center gap-2">